@@ -0,0 +1,16 @@
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from .aio import aindent, aindent_files
+
+__all__ = ["aindent", "aindent_files"]
+
+
+def __getattr__(name: str) -> object:
+    # The asyncio API is only imported when it is used, because the
+    # command-line tools import this package and don't need it.
+    if name in __all__:
+        from . import aio
+
+        return getattr(aio, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
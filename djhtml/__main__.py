@@ -8,45 +8,79 @@ standard output. Example usage:
 
     $ djhtml - < input.html > output.html
 
+Passing --stdin-batch will read a stream of templates from standard
+input that are separated by NUL characters, and write the results to
+standard output in the same way. Each template may be preceded by a
+header line that starts with the SOH character and specifies the mode
+and/or tabwidth of that template. Example usage:
+
+    $ printf '\1mode=css tabwidth=2\n%s\0%s\0' "$css" "$html" | djhtml --stdin-batch
+
 Passing a directory name will recurse into the directory and format
-all files with typical extensions. For more fine-grained control of
-which files get processed, use external tools like find, xargs or
-pre-commit.
+all files with typical extensions. Passing --all-languages will
+format the HTML, CSS, JavaScript and text files in a single run, each
+in the mode that matches its extension. Additional extensions can be
+mapped to a mode with --extra-suffix. Example usage:
+
+    $ djhtml --all-languages --extra-suffix .jinja=html .
+
+For more fine-grained control of which files get processed, use
+external tools like find, xargs or pre-commit.
 
 """
 
 from __future__ import annotations
 
+import functools
+import os
 import sys
-from collections.abc import Iterator
-from pathlib import Path
+import time
 
-from . import modes
-from .options import options
+# Parse the command-line arguments first, so that --help and --version
+# don't have to wait for the modes to be imported.
+from .options import options  # isort: split
 
+from . import files, modes, pipeline
+from .document import Document
+from .report import CHANGED, ERROR, SKIPPED, UNCHANGED, Report
 
-def main() -> None:
-    changed_files = 0
-    unchanged_files = 0
-    problematic_files = 0
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Collection, Iterator
+    from typing import BinaryIO
 
+# Each mode with its typical file extensions, keyed by the name of the
+# command-line tool without the "dj" prefix.
+MODES: dict[str, tuple[type[modes.BaseMode], list[str]]] = {
+    "html": (modes.DjHTML, [".html"]),
+    "css": (modes.DjCSS, [".css", ".scss"]),
+    "js": (modes.DjJS, [".js"]),
+    "txt": (modes.DjTXT, [".txt"]),
+}
+
+# Start and end of the optional header of a template in a batch.
+HEADER = b"\x01"
+SEPARATOR = b"\x00"
+
+
+def main() -> None:
     # Determine mode based on script name
-    script_name = Path(sys.argv[0])
-    if script_name.stem == "djtxt":
-        Mode = modes.DjTXT
-        suffixes = [".txt"]
-    elif script_name.stem == "djcss":
-        Mode = modes.DjCSS
-        suffixes = [".css", ".scss"]
-    elif script_name.stem == "djjs":
-        Mode = modes.DjJS
-        suffixes = [".js"]
-    else:
-        Mode = modes.DjHTML
-        suffixes = [".html"]
+    script_name = os.path.splitext(os.path.basename(sys.argv[0]))[0]
+    Mode = MODES.get(script_name.removeprefix("dj"), MODES["html"])[0]
 
     if len(options.input_filenames) > 1 and "-" in options.input_filenames:
         sys.exit("I’m sorry Dave, I’m afraid I can’t do that.")
+    if options.stdin_batch and options.input_filenames:
+        sys.exit("The --stdin-batch option cannot be combined with filenames.")
+    if options.report and (options.stdin_batch or "-" in options.input_filenames):
+        sys.exit("The --report option cannot be used when writing to stdout.")
+    if options.emit_edits and (options.stdin_batch or options.report):
+        sys.exit("The --emit-edits option cannot be combined with other output.")
+    if options.record_shape and (
+        len(options.input_filenames) != 1 or os.path.isdir(options.input_filenames[0])
+    ):
+        sys.exit("The --record-shape option requires a single template.")
 
     extra_blocks = {}
     extra_middle_tags = []
@@ -55,118 +89,353 @@ def main() -> None:
             extra_blocks[block_tuple[0]] = block_tuple[-1]
             extra_middle_tags.extend(block_tuple[1:-1])
 
-    for filename in _generate_filenames(options.input_filenames, suffixes):
-        # Read input file
-        try:
-            if filename == "-":
-                source = sys.stdin.read()
-            else:
-                with open(filename) as input_file:
-                    source = input_file.read()
-        except Exception as e:
-            problematic_files += 1
-            _error(str(e))
-            continue
-
-        # Guess tabwidth
-        if not options.tabwidth:
-            prev = 0
-            probabilities = [0] * 9
-            for line in source.splitlines():
-                if line and not line.isspace():
-                    depth = _get_depth(line)
-                    if abs(depth - prev) in [2, 4, 8]:
-                        probabilities[abs(depth - prev)] += 1
-                    prev = depth
-            guess = probabilities.index(max(probabilities))
-
-        # Indent input file
-        try:
-            result = Mode(
+    # The mode of each file extension that is recursed into.
+    suffix_modes = {
+        suffix: SuffixMode
+        for SuffixMode, suffixes in MODES.values()
+        if options.all_languages or SuffixMode is Mode
+        for suffix in suffixes
+    }
+    for suffix, name in options.extra_suffix or ():
+        if name not in MODES:
+            sys.exit(
+                f"Unknown mode {name!r} for {suffix}, use one of: {', '.join(MODES)}"
+            )
+        suffix_modes[suffix] = MODES[name][0]
+
+    report = Report(
+        check=options.check or bool(options.emit_edits),
+        shard="/".join(map(str, options.shard)) if options.shard else None,
+    )
+
+    if options.stdin_batch:
+        _indent_batch(
+            sys.stdin.buffer,
+            sys.stdout.buffer,
+            Mode,
+            extra_blocks,
+            extra_middle_tags,
+            report,
+        )
+
+    filenames = list(_generate_filenames(options.input_filenames, suffix_modes))
+    selected = _shard(filenames, *options.shard) if options.shard else set(filenames)
+
+    # Files are read ahead and written behind in the background when
+    # using --io-threads, and indented by a pool of threads when using
+    # --threads, but always reported and written in the same order.
+    reads = pipeline.prefetch(
+        [filename for filename in filenames if filename in selected],
+        _read_file,
+        options.io_threads,
+    )
+    indents = pipeline.prefetch(
+        reads,
+        functools.partial(
+            _timed_indent_file,
+            suffix_modes=suffix_modes,
+            Mode=Mode,
+            extra_blocks=extra_blocks,
+            extra_middle_tags=extra_middle_tags,
+        ),
+        options.threads,
+    )
+    with pipeline.Writer(options.io_threads) as writer:
+        for filename in filenames:
+            if filename not in selected:
+                writer.put(functools.partial(report.add, filename, SKIPPED))
+                continue
+            _, indent = next(indents)
+            finish, duration = indent()
+            writer.put(
+                functools.partial(_finish_file, report, filename, finish, duration)
+            )
+
+    # Print final summary
+    report.summarize()
+    if options.report == "json":
+        print(report.to_json())
+
+    # Exit with appropriate exit status
+    sys.exit(report.exit_status)
+
+
+def _read_file(filename: str) -> tuple[str, str]:
+    return files.read(filename, options.encoding)
+
+
+def _timed_indent_file(
+    item: tuple[str, Callable[[], tuple[str, str]]],
+    suffix_modes: dict[str, type[modes.BaseMode]],
+    Mode: type[modes.BaseMode],
+    extra_blocks: dict[str, str],
+    extra_middle_tags: list[str],
+) -> tuple[Callable[[], str], float]:
+    """
+    Indent a single file in the mode that matches its extension, and
+    also return how long that took.
+
+    """
+    filename, read = item
+    start = time.perf_counter()
+    finish = _indent_file(
+        filename,
+        read,
+        suffix_modes.get(os.path.splitext(filename)[1], Mode),
+        extra_blocks=extra_blocks,
+        extra_middle_tags=extra_middle_tags,
+    )
+    return finish, time.perf_counter() - start
+
+
+def _indent_file(
+    filename: str,
+    read: Callable[[], tuple[str, str]],
+    Mode: type[modes.BaseMode],
+    extra_blocks: dict[str, str],
+    extra_middle_tags: list[str],
+) -> Callable[[], str]:
+    """
+    Indent a single file. Return a function that writes the file back
+    when it changed and prints the messages, which can be called in
+    the background, and returns the status of the file for the report.
+
+    """
+    # Read input file
+    try:
+        source, newline = read()
+    except Exception as e:
+        return functools.partial(_fail, str(e))
+
+    # Save an anonymized copy, even when indenting crashes
+    if options.record_shape:
+        from . import shape
+
+        anonymized = shape.anonymize(
+            Mode(
                 source,
                 extra_blocks=extra_blocks,
                 extra_middle_tags=extra_middle_tags,
-            ).indent(options.tabwidth or guess or 4)
-        except modes.MaxLineLengthExceeded:
-            problematic_files += 1
-            _error(f"Maximum line length exceeded in {filename}")
-            continue
-        except Exception:
-            _error(
-                f"Fatal error while processing {filename}\n\n"
-                "    If you have time and are using the latest version, we\n"
-                "    would very much appreciate if you opened an issue on\n"
-                "    https://github.com/rtts/djhtml/issues\n"
+                ignore_data=options.ignore_data,
             )
-            raise
-
-        if changed := _verify_changed(source, result):
-            changed_files += 1
+        )
+        try:
+            with open(options.record_shape, "wb") as f:
+                f.write(files.encode(anonymized, newline, options.encoding))
+        except Exception as e:
+            return functools.partial(_fail, str(e))
+        recorded = f"recorded the shape of {filename} in {options.record_shape}"
+
+    # Indent input file
+    try:
+        mode = Mode(
+            source,
+            extra_blocks=extra_blocks,
+            extra_middle_tags=extra_middle_tags,
+            ignore_data=options.ignore_data,
+        )
+        mode.tokenize()
+        mode.parse()
+        document = Document(source, mode.lines)
+        tabwidth = options.tabwidth or _guess_tabwidth(source) or 4
+        if options.emit_edits:
+            edits = list(document.edits(tabwidth))
         else:
-            unchanged_files += 1
+            result = document.indent(tabwidth)
+        if options.record_shape:
+            copy = Mode.parse_document(
+                anonymized,
+                extra_blocks=extra_blocks,
+                extra_middle_tags=extra_middle_tags,
+                ignore_data=options.ignore_data,
+            )
+            if nr := shape.first_difference(mode.lines, copy.lines):
+                recorded += f", but line {nr} is tokenized differently"
+    except modes.MaxLineLengthExceeded:
+        return functools.partial(_fail, f"Maximum line length exceeded in {filename}")
+    except Exception as e:
+        return functools.partial(_crash, filename, e)
+
+    debug = document.debug() if options.debug else None
+    changed = bool(edits) if options.emit_edits else _verify_changed(source, result)
+
+    def finish() -> str:
+        if debug:
+            print(debug, file=sys.stderr)
+        if options.record_shape:
+            _info(recorded)
+
+        # Print the changes instead of writing them
+        if options.emit_edits:
+            if edits:
+                import json
+
+                print(json.dumps({"filename": filename, "edits": edits}), flush=True)
+            return CHANGED if changed else UNCHANGED
 
         # Write output file
         if not options.check:
             if filename == "-":
-                print(result, end="")
+                files.write(filename, result, newline, options.encoding)
             elif changed:
                 try:
-                    with open(filename, "w") as output_file:
-                        output_file.write(result)
+                    files.write(filename, result, newline, options.encoding)
                 except Exception as e:
-                    changed_files -= 1
-                    problematic_files += 1
-                    _error(str(e))
-                    continue
-                _info(f"reindented {output_file.name}")
+                    return _fail(str(e))
+                _info(f"reindented {filename}")
         elif changed and filename != "-":
             _info(f"would have reindented {filename}")
 
-    # Print final summary
-    s = "s" if changed_files != 1 else ""
-    have = "would have" if options.check else "have" if s else "has"
-    _info(f"{changed_files} template{s} {have} been reindented.")
-    if unchanged_files:
-        s = "s" if unchanged_files != 1 else ""
-        were = "were" if s else "was"
-        _info(f"{unchanged_files} template{s} {were} already perfect!")
-    if problematic_files:
-        s = "s" if problematic_files != 1 else ""
-        _info(
-            f"{problematic_files} template{s} could not be processed due to an error."
-        )
+        return CHANGED if changed else UNCHANGED
+
+    return finish
+
+
+def _finish_file(
+    report: Report, filename: str, finish: Callable[[], str], duration: float
+) -> None:
+    start = time.perf_counter()
+    status = finish()
+    report.add(filename, status, duration + time.perf_counter() - start)
+
+
+def _fail(msg: str) -> str:
+    _error(msg)
+    return ERROR
+
+
+def _crash(filename: str, exception: Exception) -> str:
+    _error(
+        f"Fatal error while processing {filename}\n\n"
+        "    If you have time and are using the latest version, we\n"
+        "    would very much appreciate if you opened an issue on\n"
+        "    https://github.com/rtts/djhtml/issues\n"
+    )
+    raise exception
+
+
+def _indent_batch(
+    input_stream: BinaryIO,
+    output_stream: BinaryIO,
+    Mode: type[modes.BaseMode],
+    extra_blocks: dict[str, str],
+    extra_middle_tags: list[str],
+    report: Report,
+) -> None:
+    """
+    Indent each template in the input stream and write it to the
+    output stream as soon as it is done. Templates that cannot be
+    processed are written back unchanged, so that the n-th template
+    in the output always corresponds to the n-th template in the
+    input.
+
+    """
+    for nr, document in enumerate(_read_documents(input_stream), start=1):
+        header = b""
+        if document.startswith(HEADER):
+            header, _, document = document[1:].partition(b"\n")
+        output = document
+        start = time.perf_counter()
+
+        try:
+            source, newline = files.decode(document, options.encoding)
+            settings = dict(item.split("=", 1) for item in header.decode().split())
+            DocumentMode = MODES[settings["mode"]][0] if "mode" in settings else Mode
+            tabwidth = int(settings.get("tabwidth", options.tabwidth))
+            result = DocumentMode.parse_document(
+                source,
+                extra_blocks=extra_blocks,
+                extra_middle_tags=extra_middle_tags,
+                ignore_data=options.ignore_data,
+            ).indent(tabwidth or _guess_tabwidth(source) or 4)
+        except UnicodeDecodeError as e:
+            status = ERROR
+            _error(f"{e} in template {nr}")
+        except (KeyError, ValueError):
+            status = ERROR
+            _error(f"Invalid header {header.decode()!r} of template {nr}")
+        except modes.MaxLineLengthExceeded:
+            status = ERROR
+            _error(f"Maximum line length exceeded in template {nr}")
+        else:
+            status = CHANGED if _verify_changed(source, result) else UNCHANGED
+            output = files.encode(result, newline, options.encoding)
+        report.add(f"template {nr}", status, time.perf_counter() - start)
+
+        if not options.check:
+            output_stream.write(output + SEPARATOR)
+            output_stream.flush()
+
+
+def _read_documents(stream: BinaryIO) -> Iterator[bytes]:
+    """
+    Yield the NUL-delimited documents of a binary stream one by one,
+    without reading more of the stream than necessary.
+
+    """
+    parts: list[bytes] = []
+    while chunk := stream.read1(65536):  # type: ignore[attr-defined]
+        *complete, rest = chunk.split(SEPARATOR)
+        for part in complete:
+            parts.append(part)
+            yield b"".join(parts)
+            parts = []
+        if rest:
+            parts.append(rest)
+    if parts:
+        yield b"".join(parts)
+
+
+def _shard(filenames: list[str], index: int, count: int) -> set[str]:
+    """
+    Deterministically divide the files into shards of roughly equal
+    total size, and return the files of the shard with the given
+    (1-based) index.
+
+    """
+    shards: list[list[str]] = [[] for _ in range(count)]
+    sizes = [0] * count
+
+    def size(filename: str) -> int:
+        try:
+            return os.path.getsize(filename)
+        except OSError:
+            return 0
 
-    if options.debug:
-        print(Mode(source).debug(), file=sys.stderr)
+    # Assign the largest files first, each to the smallest shard.
+    for filename_size, filename in sorted(
+        ((size(filename), filename) for filename in set(filenames)),
+        key=lambda item: (-item[0], item[1]),
+    ):
+        smallest = sizes.index(min(sizes))
+        shards[smallest].append(filename)
+        sizes[smallest] += filename_size
 
-    # Exit with appropriate exit status
-    if problematic_files:
-        sys.exit(123)
-    if options.check and changed_files:
-        sys.exit(1)
-    sys.exit(0)
+    return set(shards[index - 1])
 
 
-def _generate_filenames(paths: list[str], suffixes: list[str]) -> Iterator[str]:
+def _generate_filenames(paths: list[str], suffixes: Collection[str]) -> Iterator[str]:
     for filename in paths:
         if filename == "-":
             yield filename
         else:
-            path = Path(filename)
-            if path.is_dir():
+            path = os.path.normpath(filename)
+            if os.path.isdir(path):
                 yield from _generate_filenames_from_directory(path, suffixes)
             else:
-                yield str(path)
+                yield path
 
 
 def _generate_filenames_from_directory(
-    directory: Path, suffixes: list[str]
+    directory: str, suffixes: Collection[str]
 ) -> Iterator[str]:
-    for path in directory.iterdir():
-        if path.is_file() and path.suffix in suffixes:
-            yield str(path)
-        elif path.is_dir():
-            yield from _generate_filenames_from_directory(path, suffixes)
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            path = entry.name if directory == os.curdir else entry.path
+            if entry.is_file() and os.path.splitext(entry.name)[1] in suffixes:
+                yield path
+            elif entry.is_dir():
+                yield from _generate_filenames_from_directory(path, suffixes)
 
 
 def _verify_changed(source: str, result: str) -> bool:
@@ -180,6 +449,18 @@ def _verify_changed(source: str, result: str) -> bool:
     return changed
 
 
+def _guess_tabwidth(source: str) -> int:
+    prev = 0
+    probabilities = [0] * 9
+    for line in source.splitlines():
+        if line and not line.isspace():
+            depth = _get_depth(line)
+            if abs(depth - prev) in [2, 4, 8]:
+                probabilities[abs(depth - prev)] += 1
+            prev = depth
+    return probabilities.index(max(probabilities))
+
+
 def _get_depth(line: str) -> int:
     count = 0
     for char in line:
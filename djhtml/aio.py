@@ -0,0 +1,157 @@
+"""
+Indent templates without blocking the asyncio event loop. Usage:
+
+    result = await aindent(source, tabwidth=2)
+
+    async for filename, result in aindent_files(filenames, concurrency=4):
+        print(filename, "has been indented")
+
+The actual work is done by an executor, which is the default executor
+of the event loop unless another one is given. A ThreadPoolExecutor
+runs templates in parallel on free-threaded builds of Python, and a
+ProcessPoolExecutor does so everywhere.
+
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+
+from . import files
+from .modes import DjHTML
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, Iterable
+    from concurrent.futures import Executor
+
+    from .modes import BaseMode
+
+
+async def aindent(
+    source: str,
+    tabwidth: int = 4,
+    Mode: type[BaseMode] = DjHTML,
+    executor: Executor | None = None,
+    extra_blocks: dict[str, str] | None = None,
+    extra_middle_tags: list[str] | None = None,
+    ignore_data: bool = False,
+) -> str:
+    """
+    Return the indented source, which is computed by the executor.
+    When the calling task is cancelled, a template that is already
+    being indented is finished in the background and then discarded.
+
+    """
+    return await asyncio.get_running_loop().run_in_executor(
+        executor,
+        functools.partial(
+            _indent,
+            source,
+            tabwidth,
+            Mode,
+            extra_blocks,
+            extra_middle_tags,
+            ignore_data,
+        ),
+    )
+
+
+async def aindent_files(
+    filenames: Iterable[str],
+    tabwidth: int = 4,
+    Mode: type[BaseMode] = DjHTML,
+    executor: Executor | None = None,
+    concurrency: int = 4,
+    write: bool = False,
+    encoding: str = "utf-8",
+    extra_blocks: dict[str, str] | None = None,
+    extra_middle_tags: list[str] | None = None,
+    ignore_data: bool = False,
+) -> AsyncGenerator[tuple[str, str], None]:
+    """
+    Read and indent the files in the executor, and yield each filename
+    together with the indented text as soon as it is done. With write,
+    files whose indentation changed are also written back.
+
+    At most the given number of files are being processed at any time.
+    New files are only started when the results are consumed, so that
+    a slow consumer doesn't cause the results to pile up in memory.
+    When the consumer stops iterating, or an exception is raised by one
+    of the files, the files that haven't been started are cancelled.
+
+    """
+    if concurrency < 1:
+        raise ValueError("The concurrency must be at least 1.")
+
+    loop = asyncio.get_running_loop()
+    remaining = iter(filenames)
+    pending: set[asyncio.Future[tuple[str, str]]] = set()
+    try:
+        while True:
+            for filename in remaining:
+                pending.add(
+                    loop.run_in_executor(
+                        executor,
+                        functools.partial(
+                            _indent_file,
+                            filename,
+                            tabwidth,
+                            Mode,
+                            write,
+                            encoding,
+                            extra_blocks,
+                            extra_middle_tags,
+                            ignore_data,
+                        ),
+                    )
+                )
+                if len(pending) >= concurrency:
+                    break
+            if not pending:
+                return
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                yield future.result()
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def _indent(
+    source: str,
+    tabwidth: int,
+    Mode: type[BaseMode],
+    extra_blocks: dict[str, str] | None,
+    extra_middle_tags: list[str] | None,
+    ignore_data: bool,
+) -> str:
+    return Mode.parse_document(
+        source,
+        extra_blocks=extra_blocks,
+        extra_middle_tags=extra_middle_tags,
+        ignore_data=ignore_data,
+    ).indent(tabwidth)
+
+
+def _indent_file(
+    filename: str,
+    tabwidth: int,
+    Mode: type[BaseMode],
+    write: bool,
+    encoding: str,
+    extra_blocks: dict[str, str] | None,
+    extra_middle_tags: list[str] | None,
+    ignore_data: bool,
+) -> tuple[str, str]:
+    source, newline = files.read(filename, encoding)
+    result = _indent(
+        source, tabwidth, Mode, extra_blocks, extra_middle_tags, ignore_data
+    )
+    if write and result != source:
+        files.write(filename, result, newline, encoding)
+    return filename, result
@@ -0,0 +1,295 @@
+"""
+Timing the tokenizer and parser on real templates, or on anonymized
+copies of them that were saved with --record-shape. Usage:
+
+    $ djhtml --check --record-shape slow.shape.html slow.html
+    $ djhtml-bench tokenize slow.shape.html
+
+A whole directory of templates can be timed before and after an
+upgrade, to find the templates that became slower:
+
+    $ djhtml-bench replay --save baseline.json templates/
+    $ pip install --upgrade djhtml
+    $ djhtml-bench replay --baseline baseline.json templates/
+
+"""
+
+from __future__ import annotations
+
+import sys
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+    from typing import Any
+
+    from .hooks import Profiler
+    from .modes import BaseMode
+
+# The number of times each template is run by default. The tokenize
+# command reports the fastest run, which is the one least disturbed by
+# other processes, and the replay command compares the median times.
+REPEAT = 5
+
+# The mode of each file extension that is replayed.
+SUFFIXES = {
+    ".html": "html",
+    ".css": "css",
+    ".scss": "css",
+    ".js": "js",
+    ".txt": "txt",
+}
+
+# Differences in the median time that are smaller than this number of
+# seconds, or than this multiple of the spread of the times, are
+# considered to be noise.
+MIN_DIFFERENCE = 0.0001
+NOISE_FACTOR = 3
+
+
+def profile(source: str, Mode: type[BaseMode], repeat: int = REPEAT) -> Profiler:
+    """
+    Tokenize and parse the source a number of times, and return the
+    profiler of the fastest run.
+
+    """
+    from .hooks import Profiler
+
+    profilers = []
+    for _ in range(max(repeat, 1)):
+        profiler = Profiler()
+        Mode.parse_document(source, hooks=profiler)
+        profilers.append(profiler)
+    return min(profilers, key=lambda p: p.timings["tokenize"] + p.timings["parse"])
+
+
+def measure(source: str, Mode: type[BaseMode], repeat: int = REPEAT) -> dict[str, Any]:
+    """
+    Indent the source a number of times, and return the number of
+    bytes and tokens, the peak memory usage and the time of each run.
+    The memory is measured in a separate run, because tracing memory
+    allocations slows everything down.
+
+    """
+    import time
+    import tracemalloc
+
+    times = []
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        document = Mode.parse_document(source)
+        document.indent(4)
+        times.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        Mode.parse_document(source).indent(4)
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "mode": Mode.__name__,
+        "bytes": len(source.encode()),
+        "tokens": sum(len(line.tokens) for line in document.lines),
+        "peak_memory": peak_memory,
+        "times": times,
+    }
+
+
+def replay(
+    directory: str, mode_names: Mapping[str, type[BaseMode]], repeat: int = REPEAT
+) -> dict[str, Any]:
+    """
+    Measure all templates in the directory, each in the mode that
+    matches its extension, skipping the ones that can't be read or
+    indented. The results are keyed by the path relative
+    to the directory, so that they can be compared with the results of
+    a copy of the directory elsewhere.
+
+    """
+    import os
+
+    from . import files
+    from .modes import MaxLineLengthExceeded
+
+    results = {}
+    for root, dirnames, filenames in os.walk(directory):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            name = SUFFIXES.get(os.path.splitext(filename)[1])
+            if not name:
+                continue
+            path = os.path.join(root, filename)
+            try:
+                source, _ = files.read(path, "utf-8")
+            except (OSError, UnicodeDecodeError) as e:
+                _info(f"Skipping {path}: {e}")
+                continue
+            try:
+                result = measure(source, mode_names[name], repeat)
+            except MaxLineLengthExceeded:
+                _info(f"Skipping {path}: maximum line length exceeded")
+                continue
+            except Exception as e:
+                _info(f"Skipping {path}: {type(e).__name__}: {e}")
+                continue
+            key = os.path.relpath(path, directory).replace(os.sep, "/")
+            results[key] = result
+    return {"repeat": repeat, "files": results}
+
+
+def compare(
+    baseline: dict[str, Any], results: dict[str, Any], threshold: float
+) -> list[tuple[str, float, float]]:
+    """
+    Return the files that became slower than in the baseline by more
+    than the threshold (a fraction) and more than the noise, with the
+    median times before and after, from the largest slowdown down.
+
+    """
+    from math import inf
+    from statistics import median
+
+    regressions = []
+    for key, result in results["files"].items():
+        if key not in baseline["files"]:
+            continue
+        before = baseline["files"][key]["times"]
+        after = result["times"]
+        old, new = median(before), median(after)
+        noise = NOISE_FACTOR * (_spread(before) + _spread(after))
+        if new - old > max(old * threshold, noise, MIN_DIFFERENCE):
+            regressions.append((key, old, new))
+    # A median of zero means the timer was too coarse for the file.
+    return sorted(regressions, key=lambda r: r[2] / r[1] if r[1] else inf, reverse=True)
+
+
+def main() -> None:
+    """
+    Entrypoint for the djhtml-bench command.
+
+    """
+    import argparse
+
+    from . import files, modes
+
+    mode_names = {
+        "html": modes.DjHTML,
+        "css": modes.DjCSS,
+        "js": modes.DjJS,
+        "txt": modes.DjTXT,
+    }
+    parser = argparse.ArgumentParser(
+        description="Time the tokenizer and parser of DjHTML."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    tokenize = commands.add_parser(
+        "tokenize", help="time tokenizing and parsing the given templates"
+    )
+    tokenize.add_argument(
+        "filenames", metavar="FILE", nargs="+", help="template file(s)"
+    )
+    tokenize.add_argument(
+        "--mode",
+        choices=list(mode_names),
+        default="html",
+        help="the mode of the templates (the default is html)",
+    )
+    replay_command = commands.add_parser(
+        "replay", help="time indenting all templates in a directory"
+    )
+    replay_command.add_argument("directory", metavar="DIR", help="template directory")
+    replay_command.add_argument(
+        "--save", metavar="FILE", help="save the timings to FILE as a baseline"
+    )
+    replay_command.add_argument(
+        "--baseline",
+        metavar="FILE",
+        help="report the templates that became slower than in FILE",
+    )
+    replay_command.add_argument(
+        "--threshold",
+        metavar="PERCENT",
+        type=float,
+        default=5,
+        help="ignore slowdowns of less than PERCENT (the default is 5)",
+    )
+    replay_command.add_argument(
+        "--top",
+        metavar="N",
+        type=int,
+        default=10,
+        help="only report the N largest slowdowns (the default is 10)",
+    )
+    for command in [tokenize, replay_command]:
+        command.add_argument(
+            "--repeat",
+            metavar="N",
+            type=int,
+            default=REPEAT,
+            help=f"run each template N times (the default is {REPEAT})",
+        )
+    args = parser.parse_args()
+
+    if args.command == "tokenize":
+        for filename in args.filenames:
+            try:
+                source, _ = files.read(filename, "utf-8")
+            except (OSError, UnicodeDecodeError) as e:
+                sys.exit(f"Error: could not read {filename}: {e}")
+            profiler = profile(source, mode_names[args.mode], args.repeat)
+            print(f"{filename}: {len(source)} characters")
+            print(profiler.summary())
+        return
+
+    import json
+    from statistics import median
+
+    baseline = None
+    if args.baseline:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            sys.exit(f"Error: could not read baseline {args.baseline}: {e}")
+
+    results = replay(args.directory, mode_names, args.repeat)
+    if args.save:
+        with open(args.save, "w") as f:
+            f.write(json.dumps(results, indent=2) + "\n")
+
+    measured = results["files"].values()
+    total = sum(median(result["times"]) for result in measured)
+    _info(f"{len(measured)} templates took {total * 1000:.1f} ms")
+    if baseline is None:
+        return
+
+    regressions = compare(baseline, results, args.threshold / 100)
+    s = "s" if len(regressions) != 1 else ""
+    _info(f"{len(regressions)} template{s} became slower than the baseline.")
+    for key, old, new in regressions[: args.top]:
+        factor = f" ({new / old:.2f}x)" if old else ""
+        print(f"{key}: {old * 1000:.2f} ms -> {new * 1000:.2f} ms{factor}")
+    sys.exit(1 if regressions else 0)
+
+
+def _spread(times: list[float]) -> float:
+    """
+    The median absolute deviation, which unlike the standard deviation
+    isn't thrown off by a single run that was interrupted.
+
+    """
+    from statistics import median
+
+    center = median(times)
+    return median(abs(t - center) for t in times)
+
+
+def _info(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
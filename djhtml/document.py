@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from .lines import Line
+
+
+class Document:
+    """
+    A source text that has been tokenized and parsed, and can be
+    rendered as many times as needed without doing so again. Usage:
+
+        document = DjHTML.parse_document(source)
+        print(document.indent(2))
+        print(document.indent(4))
+
+    Rendering doesn't modify the document, so it can be shared between
+    threads.
+
+    """
+
+    def __init__(self, source: str, lines: list[Line]) -> None:
+        self.source = source
+        self.lines = lines
+
+    @property
+    def levels(self) -> list[int]:
+        """
+        The indentation level of each line.
+
+        """
+        return [line.level for line in self.lines]
+
+    @property
+    def offsets(self) -> list[int]:
+        """
+        The number of spaces added to the indentation of each line,
+        regardless of the tabwidth.
+
+        """
+        return [line.offset for line in self.lines]
+
+    def indent(self, tabwidth: int) -> str:
+        """
+        Return the indented text as a single string.
+
+        """
+        return "\n".join([line.indent(tabwidth) for line in self.lines])
+
+    def debug(self) -> str:
+        """
+        Return the Python representation of the lines and tokens.
+
+        """
+        return "\n".join([repr(line) for line in self.lines])
+
+    def changed(self, tabwidth: int) -> bool:
+        """
+        Whether indenting with the given tabwidth changes the source,
+        without building the indented text.
+
+        """
+        return any(line.indent(tabwidth) != line.text for line in self.lines)
+
+    def edits(self, tabwidth: int) -> Iterator[tuple[int, str, str]]:
+        """
+        Yield (line_number, old_indent, new_indent) for each line of
+        the source whose indentation changes, without building the
+        indented text. Line numbers start at 1. Unlike indent(), the
+        edits leave trailing whitespace alone.
+
+        """
+        line_number = 1
+        for line in self.lines:
+            text = line.text
+            if not line.ignore:
+                content = text.lstrip()
+                old_indent = text[: len(text) - len(content)]
+                new_indent = ""
+                if content.strip():
+                    new_indent = " " * (tabwidth * line.level + line.offset)
+                if new_indent != old_indent:
+                    yield line_number, old_indent, new_indent
+            line_number += text.count("\n") + 1
+
+    def diff(self, tabwidth: int, filename: str = "template") -> str:
+        """
+        Return the changes made by indenting with the given tabwidth
+        as a unified diff.
+
+        """
+        import difflib
+
+        return "".join(
+            difflib.unified_diff(
+                self.source.splitlines(keepends=True),
+                self.indent(tabwidth).splitlines(keepends=True),
+                filename,
+                filename,
+            )
+        )
@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from .lines import Line
+    from .modes import BaseMode
+    from .tokens import Token
+
+
+class Event:
+    """
+    A token as seen by the tokenizer and the parser, for tools that
+    want to reuse the work of DjHTML instead of parsing the template
+    again. Usage:
+
+        for event in DjHTML.events(source):
+            print(event.line_number, event.level, event.depth, event.token)
+
+    The span is the position of the token in the source, so that
+    source[event.start:event.end] == event.token.text. The line number
+    is that of the token's line in the output, which can differ from
+    the line number in the source when tokens contain newlines.
+
+    """
+
+    __slots__ = ["token", "line", "line_number", "start", "end", "depth"]
+
+    def __init__(
+        self,
+        token: Token.BaseToken,
+        line: Line,
+        line_number: int,
+        start: int,
+        end: int,
+        depth: int,
+    ) -> None:
+        self.token = token
+        self.line = line
+        self.line_number = line_number
+        self.start = start
+        self.end = end
+        self.depth = depth
+
+    @property
+    def mode(self) -> type[BaseMode]:
+        """
+        The mode that created the token.
+
+        """
+        return self.token.mode
+
+    @property
+    def level(self) -> int:
+        """
+        The final indentation level of the token's line.
+
+        """
+        return self.line.level
+
+    @property
+    def offset(self) -> int:
+        """
+        The number of spaces added to the indentation of the token's
+        line, regardless of the tabwidth.
+
+        """
+        return self.line.offset
+
+    def __repr__(self) -> str:
+        return (
+            f"Event({self.token!r}, line_number={self.line_number}, "
+            f"start={self.start}, end={self.end}, depth={self.depth})"
+        )
@@ -0,0 +1,105 @@
+"""
+Reading and writing templates as bytes. Usage:
+
+    source, newline = read("template.html", "utf-8")
+    write("template.html", result, newline, "utf-8")
+
+Templates are decoded explicitly instead of with the locale's
+encoding, and their line endings are converted to "\n" for the
+indenter and back to the original style when writing.
+
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import sys
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    import mmap
+
+# Files at least this large are memory-mapped instead of read.
+MMAP_THRESHOLD = 1024 * 1024
+
+NEWLINE_RE = re.compile(r"\r\n?|\n")
+
+
+def read(filename: str, encoding: str) -> tuple[str, str]:
+    """
+    Return the decoded contents of a file (or stdin when the filename
+    is "-") and its newline style.
+
+    """
+    if filename == "-":
+        return decode(sys.stdin.buffer.read(), encoding)
+
+    with open(filename, "rb") as f:
+        if os.fstat(f.fileno()).st_size < MMAP_THRESHOLD:
+            return decode(f.read(), encoding)
+
+        import mmap
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return decode(data, encoding)
+
+
+def write(filename: str, text: str, newline: str, encoding: str) -> None:
+    """
+    Write text to a file (or stdout when the filename is "-") using
+    the given newline style. Files are replaced atomically with the
+    same permissions, so that they are never left half-written, unless
+    they have multiple hard links or their directory isn't writable.
+
+    """
+    data = encode(text, newline, encoding)
+
+    if filename == "-":
+        sys.stdout.buffer.write(data)
+        sys.stdout.buffer.flush()
+        return
+
+    # Write through symbolic links instead of replacing them.
+    path = os.path.realpath(filename)
+    stat = os.stat(path)
+    if stat.st_nlink > 1 or not os.access(os.path.dirname(path), os.W_OK):
+        # Replacing the file would break its hard links, or isn't
+        # allowed in this directory, so overwrite it in place.
+        with open(path, "wb") as f:
+            f.write(data)
+        return
+
+    temp_path = f"{path}.{os.getpid()}.djhtml"
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    try:
+        with open(fd, "wb") as f:
+            f.write(data)
+        # Unlike the mode passed to os.open(), this isn't masked by
+        # the umask.
+        os.chmod(temp_path, stat.st_mode & 0o7777)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def decode(data: bytes | mmap.mmap, encoding: str) -> tuple[str, str]:
+    """
+    Decode text and return it with "\n" line endings, together with
+    the style of its first line ending.
+
+    """
+    text = str(data, encoding)
+    if "\r" not in text:
+        return text, "\n"
+    match = NEWLINE_RE.search(text)
+    newline = match.group() if match else "\n"
+    return NEWLINE_RE.sub("\n", text), newline
+
+
+def encode(text: str, newline: str, encoding: str) -> bytes:
+    if newline != "\n":
+        text = text.replace("\n", newline)
+    return text.encode(encoding)
@@ -0,0 +1,148 @@
+"""
+Hooks into the tokenizer and parser, to find out why a template is
+indented slowly or strangely. Usage:
+
+    profiler = Profiler()
+    DjHTML.parse_document(source, hooks=profiler)
+    print(profiler.summary())
+
+Subclass Hooks and override the methods you are interested in to
+receive the events. When no hooks are given, the tokenizer and parser
+are not instrumented at all, so hooks cost nothing unless they are
+used.
+
+"""
+
+from __future__ import annotations
+
+import time
+from collections import Counter, defaultdict
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from .lines import Line
+    from .modes import BaseMode
+    from .tokens import Token
+
+
+class Hooks:
+    """
+    Base class with a method for each event, which do nothing.
+
+    """
+
+    def started(self, phase: str) -> None:
+        """
+        The "tokenize" or "parse" phase started.
+
+        """
+
+    def finished(self, phase: str) -> None:
+        """
+        The "tokenize" or "parse" phase finished.
+
+        """
+
+    def token_created(self, token: Token.BaseToken, mode: BaseMode) -> None:
+        """
+        The mode created a token.
+
+        """
+
+    def mode_switched(self, old_mode: BaseMode, new_mode: BaseMode) -> None:
+        """
+        The tokenizer switched to a different mode.
+
+        """
+
+    def pushed(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        """
+        The parser pushed an opening token onto the stack.
+
+        """
+
+    def popped(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        """
+        The parser popped an opening token from the stack.
+
+        """
+
+    def mismatch(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        """
+        The parser found a closing token that does not match the
+        opening token on top of the stack, and is about to recover.
+
+        """
+
+    def line_finalized(self, line: Line) -> None:
+        """
+        The parser determined the final level and offset of a line.
+
+        """
+
+
+class Profiler(Hooks):
+    """
+    Hooks that count the events and measure how much time is spent
+    in each phase and mode.
+
+    """
+
+    def __init__(self) -> None:
+        self.counts: Counter[str] = Counter()
+        self.tokens: Counter[tuple[str, str]] = Counter()
+        self.timings: defaultdict[str, float] = defaultdict(float)
+        self.mode: BaseMode | None = None
+        self.phase_start = self.mode_start = 0.0
+
+    def started(self, phase: str) -> None:
+        self.phase_start = self.mode_start = time.perf_counter()
+
+    def finished(self, phase: str) -> None:
+        now = time.perf_counter()
+        self.timings[phase] += now - self.phase_start
+        if phase == "tokenize" and self.mode:
+            self.timings[type(self.mode).__name__] += now - self.mode_start
+            self.mode = None
+
+    def token_created(self, token: Token.BaseToken, mode: BaseMode) -> None:
+        self.tokens[type(token).__name__, token.mode.__name__] += 1
+        if not self.mode:
+            self.mode = mode
+
+    def mode_switched(self, old_mode: BaseMode, new_mode: BaseMode) -> None:
+        now = time.perf_counter()
+        self.counts["mode switches"] += 1
+        self.timings[type(old_mode).__name__] += now - self.mode_start
+        self.mode = new_mode
+        self.mode_start = now
+
+    def pushed(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        self.counts["pushes"] += 1
+        self.counts["max stack depth"] = max(self.counts["max stack depth"], len(stack))
+
+    def popped(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        self.counts["pops"] += 1
+
+    def mismatch(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        self.counts["mismatches"] += 1
+
+    def line_finalized(self, line: Line) -> None:
+        self.counts["lines"] += 1
+
+    def summary(self) -> str:
+        """
+        Return the counters and timings as human readable text.
+
+        """
+        result = [f"{name}: {count}" for name, count in self.counts.items()]
+        result += [
+            f"{token_type} tokens in {mode}: {count}"
+            for (token_type, mode), count in self.tokens.most_common()
+        ]
+        result += [
+            f"time in {name}: {seconds * 1000:.1f} ms"
+            for name, seconds in sorted(self.timings.items(), key=lambda t: -t[1])
+        ]
+        return "\n".join(result)
@@ -2,21 +2,39 @@ from __future__ import annotations
 
 import re
 from abc import ABC, abstractmethod
-from typing import ClassVar, Sequence, TypedDict
 
+from .document import Document
+from .events import Event
 from .lines import Line
 from .tokens import Token
 
+TYPE_CHECKING = False
 
-class OffsetDict(TypedDict):
-    relative: int
-    absolute: int
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from typing import ClassVar, Sequence, SupportsIndex, TypedDict
+
+    from .hooks import Hooks
+
+    class OffsetDict(TypedDict):
+        relative: int
+        absolute: int
+
+else:
+    # Importing the typing module takes longer than everything else
+    # combined, so at runtime the offsets are just plain dictionaries.
+    OffsetDict = dict
 
 
 class BaseMode(ABC):
     """
     Base class for the different modes.
 
+    A mode instance keeps track of its position and offsets while
+    tokenizing and parsing a single source, so it must not be shared
+    between threads. Different instances don't share any mutable
+    state, so any number of templates can be indented concurrently.
+
     """
 
     RAW_TOKENS: ClassVar[Sequence[str]]
@@ -25,10 +43,12 @@ class BaseMode(ABC):
 
     offsets: OffsetDict
     previous_offsets: list[OffsetDict]
+    hooks: Hooks | None = None
+    ignore_data = False
 
     @abstractmethod
     def create_token(
-        self, raw_token: str, src: str, line: Line
+        self, raw_token: str, src: Source, line: Line
     ) -> tuple[Token.BaseToken, BaseMode]: ...
 
     def __init__(
@@ -37,10 +57,15 @@ class BaseMode(ABC):
         return_mode: BaseMode | None = None,
         extra_blocks: dict[str, str] | None = None,
         extra_middle_tags: list[str] | None = None,
+        hooks: Hooks | None = None,
+        ignore_data: bool = False,
     ) -> None:
         """
         Instantiate with source text before calling indent(), or
         with the return_mode when invoked from within another mode.
+        The hooks, if any, are called while tokenizing and parsing.
+        With ignore_data, the contents of <script> elements with JSON
+        data are left untouched.
 
         """
         assert type(self) is not BaseMode
@@ -48,14 +73,83 @@ class BaseMode(ABC):
 
         self.source = source
         self.return_mode = return_mode or self
-        self.token_re = compile_re(self.RAW_TOKENS)
+        self.token_re = compile_scanner(self.RAW_TOKENS)
         self.extra_blocks = extra_blocks or {}
         self.extra_middle_tags = extra_middle_tags or []
+        self.hooks = hooks
+        self.ignore_data = ignore_data
 
         # To keep track of the current and previous offsets.
         self.offsets = OffsetDict(relative=0, absolute=0)
         self.previous_offsets = []
 
+    @classmethod
+    def parse_document(
+        cls,
+        source: str,
+        extra_blocks: dict[str, str] | None = None,
+        extra_middle_tags: list[str] | None = None,
+        hooks: Hooks | None = None,
+        ignore_data: bool = False,
+    ) -> Document:
+        """
+        Tokenize and parse the source text once, returning a document
+        that can be indented with different tabwidths.
+
+        """
+        mode = cls(
+            source,
+            extra_blocks=extra_blocks,
+            extra_middle_tags=extra_middle_tags,
+            hooks=hooks,
+            ignore_data=ignore_data,
+        )
+        mode.tokenize()
+        mode.parse()
+        return Document(source, mode.lines)
+
+    @classmethod
+    def events(
+        cls,
+        source: str,
+        extra_blocks: dict[str, str] | None = None,
+        extra_middle_tags: list[str] | None = None,
+        hooks: Hooks | None = None,
+        ignore_data: bool = False,
+    ) -> Iterator[Event]:
+        """
+        Tokenize and parse the source text in a single pass, yielding
+        an event for each token as soon as the level of its line has
+        been determined. The lines are not kept in memory.
+
+        """
+        mode = cls(
+            source,
+            extra_blocks=extra_blocks,
+            extra_middle_tags=extra_middle_tags,
+            hooks=hooks,
+            ignore_data=ignore_data,
+        )
+        stack: list[Token.BaseToken] = _TracedStack(hooks) if hooks else []
+
+        def tokenize_lines() -> Iterator[Line]:
+            for line in mode.tokenize_lines():
+                line.tokens = _DepthRecorder(line.tokens, stack)
+                yield line
+
+        pos = 0
+        for line_number, line in enumerate(
+            mode.parse_lines(tokenize_lines(), stack), start=1
+        ):
+            assert isinstance(line.tokens, _DepthRecorder)
+            depths = line.tokens.depths
+            line.tokens = line.tokens[:]
+            for token, depth in zip(line.tokens, depths):
+                end = pos + len(token.text)
+                yield Event(token, line, line_number, pos, end, depth)
+                pos = end
+            pos += 1
+
     def indent(self, tabwidth: int) -> str:
         """
         Return the indented text as a single string.
@@ -63,7 +157,7 @@ class BaseMode(ABC):
         """
         self.tokenize()
         self.parse()
-        return "\n".join([line.indent(tabwidth) for line in self.lines])
+        return Document(self.source, self.lines).indent(tabwidth)
 
     def tokenize(self) -> None:
         """
@@ -78,46 +172,89 @@ class BaseMode(ABC):
         mode alongside the token.
 
         """
-        self.lines = []
+        if self.hooks:
+            self.hooks.started("tokenize")
+        self.lines = list(self.tokenize_lines())
+        if self.hooks:
+            self.hooks.finished("tokenize")
+
+    def tokenize_lines(self) -> Iterator[Line]:
+        """
+        Like tokenize(), but yield each line as soon as it is
+        complete, so that the lines don't have to be kept in memory.
+
+        """
         line = Line()
+        skipped: list[Line] = []
         mode = self
-        src = self.source
+        if self.hooks:
+            _trace(self, self.hooks)
+        text = self.source
+        src = Source(text)
+        pos = 0
 
         while True:
-            if src.find("\n") > mode.MAX_LINE_LENGTH:
+            if text.find("\n", pos) - pos > mode.MAX_LINE_LENGTH:
                 raise MaxLineLengthExceeded
 
-            try:
-                # Split the source at the first occurrence of one of
-                # the current mode's raw tokens.
-                head, raw_token, tail = mode.token_re.split(src, maxsplit=1)
+            if isinstance(mode, Comment) and mode.SKIP_IN_BULK:
+                # Skip the whole comment at once.
+                line, pos, mode = mode.skip(text, pos, line, skipped)
+                yield from skipped
+                skipped.clear()
+                src.pos = pos
+                if not isinstance(mode, Comment):
+                    continue
+
+                # We've reached the final line inside the comment!
+                yield line
+                return
+
+            # Find the first occurrence of one of the current mode's
+            # raw tokens.
+            match = mode.token_re.search(text, pos)
 
-            except ValueError:
+            if not match:
                 # We've reached the final line!
-                if src:
-                    token, _ = mode.create_token(src, "", line)
+                if pos < len(text):
+                    src.pos = len(text)
+                    token, _ = mode.create_token(text[pos:], src, line)
                     line.append(token)
-                self.lines.append(line)
-                break
+                yield line
+                return
 
-            if head:
+            token_start, token_end = match.span()
+            raw_token = match.group()
+
+            if token_start > pos:
                 # Create a token from the head.
-                token, mode = mode.create_token(head, raw_token + tail, line)
+                src.pos = token_start
+                token, mode = mode.create_token(text[pos:token_start], src, line)
                 line.append(token)
 
+            # Set the new position to the end of the raw token.
+            pos = src.pos = token_end
+
             if raw_token == "\n":
-                self.lines.append(line)
+                yield line
                 line = Line()
 
             else:
                 # Create a token from the tail
-                token, mode = mode.create_token(raw_token, tail, line)
+                token, mode = mode.create_token(raw_token, src, line)
                 line.append(token)
 
-            # Set the new source to the old tail for the next iteration.
-            src = tail
-
     def parse(self) -> None:
+        """
+        Determine the level of each line. See parse_lines().
+
+        """
+        for _ in self.parse_lines(self.lines):
+            pass
+
+    def parse_lines(
+        self, lines: Iterable[Line], stack: list[Token.BaseToken] | None = None
+    ) -> Iterator[Line]:
         """
         You found the top-secret indenting algorithm!
 
@@ -126,8 +263,19 @@ class BaseMode(ABC):
         the algorithm independent of the language (HTML, CSS, JS), and
         thereby accomodates different languages used interchangeably.
 
+        Each line is yielded as soon as its level is determined. The
+        stack of opening tokens can be passed in to follow along.
+
         """
-        stack: list[Token.BaseToken] = []
+        hooks = self.hooks
+        if hooks:
+            hooks.started("parse")
+        # Only trace the stack and lines when there are hooks, so that
+        # the parser doesn't pay for them otherwise.
+        if stack is None:
+            stack = _TracedStack(hooks) if hooks else []
+        if hooks:
+            lines = _finalize_lines(lines, hooks)
 
         def mode_in_stack(mode: type[BaseMode]) -> bool:
             """
@@ -143,7 +291,7 @@ class BaseMode(ABC):
                     return True
             return False
 
-        for line in self.lines:
+        for line in lines:
             first_token = True
             for token in line.tokens:
                 opening_token = None
@@ -160,6 +308,8 @@ class BaseMode(ABC):
                         # mode. Pop the stack until the correct
                         # opening token is found.
                         elif mode_in_stack(token.mode):
+                            if hooks:
+                                hooks.mismatch(token, stack)
                             opening_token = stack.pop()
                             while opening_token.mode is not token.mode:
                                 opening_token = stack.pop()
@@ -168,6 +318,8 @@ class BaseMode(ABC):
                         # the same mode. Set the line level to a sane
                         # value.
                         elif first_token:
+                            if hooks:
+                                hooks.mismatch(token, stack)
                             line.level = stack[-1].level + 1
 
                         # Success! If the dedenting token is first in
@@ -198,10 +350,15 @@ class BaseMode(ABC):
                 if token.text.strip():
                     first_token = False
 
+            yield line
+
+        if hooks:
+            hooks.finished("parse")
+
     def debug(self) -> str:
         self.tokenize()
         self.parse()
-        return "\n".join([repr(line) for line in self.lines])
+        return Document(self.source, self.lines).debug()
 
 
 class DjTXT(BaseMode):
@@ -239,7 +396,7 @@ class DjTXT(BaseMode):
     OPENING_TAG = r"{%[-+]? *[#/]?(\w+).*?[-+]?%}"
 
     def create_token(
-        self, raw_token: str, src: str, line: Line
+        self, raw_token: str, src: Source, line: Line
     ) -> tuple[Token.BaseToken, BaseMode]:
         mode = self
 
@@ -272,11 +429,11 @@ class DjTXT(BaseMode):
 
         return token, mode
 
-    def _has_closing_token(self, name: str, raw_token: str, src: str) -> bool:
+    def _has_closing_token(self, name: str, raw_token: str, src: Source) -> bool:
         endtag = self.extra_blocks.get(name)
         if endtag:
-            return bool(re.search(f"{{%[-+]? *{endtag}(?: .*?|)%}}", src))
-        if not re.search(f"{{%[-+]? *(end_?|/){name}(?: .*?|)%}}", src):
+            return bool(src.search(f"{{%[-+]? *{endtag}(?: .*?|)%}}"))
+        if not src.search(f"{{%[-+]? *(end_?|/){name}(?: .*?|)%}}"):
             return False
         if regex := self.AMBIGUOUS_BLOCK_TAGS.get(name):
             if regex[0]:
@@ -319,12 +476,12 @@ class DjHTML(DjTXT):
     ]
 
     def create_token(
-        self, raw_token: str, src: str, line: Line
+        self, raw_token: str, src: Source, line: Line
     ) -> tuple[Token.BaseToken, "BaseMode"]:
         mode: BaseMode = self
 
         if raw_token == "<":
-            if match := re.match(r"([\w\-\.:]+)(\s*)", src):
+            if match := src.match(r"([\w\-\.:]+)(\s*)"):
                 tagname = match[1]
                 following_spaces = match[2]
                 absolute = True
@@ -379,7 +536,7 @@ class DjCSS(DjTXT):
     ]
 
     def create_token(
-        self, raw_token: str, src: str, line: Line
+        self, raw_token: str, src: Source, line: Line
     ) -> tuple[Token.BaseToken, "BaseMode"]:
         mode: BaseMode = self
 
@@ -445,8 +602,12 @@ class DjJS(DjTXT):
         return_mode: BaseMode | None = None,
         extra_blocks: dict[str, str] | None = None,
         extra_middle_tags: list[str] | None = None,
+        hooks: Hooks | None = None,
+        ignore_data: bool = False,
     ) -> None:
-        super().__init__(source, return_mode, extra_blocks, extra_middle_tags)
+        super().__init__(
+            source, return_mode, extra_blocks, extra_middle_tags, hooks, ignore_data
+        )
         self.haskell = False
         self.haskell_re = re.compile(r"^ *, ([$\w-]+ *=|[$\w-]+;?)")
         self.variable_re = re.compile(r"^ *([$\w-]+ *=|[$\w-]+;?)")
@@ -455,7 +616,7 @@ class DjJS(DjTXT):
         self.extra_middle_tags = []
 
     def create_token(
-        self, raw_token: str, src: str, line: Line
+        self, raw_token: str, src: Source, line: Line
     ) -> tuple[Token.BaseToken, "BaseMode"]:
         mode: BaseMode = self
         persist_relative_offset = False
@@ -548,6 +709,47 @@ class DjJS(DjTXT):
         return token, mode
 
 
+class DjJSON(DjTXT):
+    """
+    Mode for indenting JSON data, such as import maps, in <script>
+    elements. Only brackets and strings are taken into account, which
+    is much faster than indenting JSON as JavaScript.
+
+    """
+
+    RAW_TOKENS = DjTXT.RAW_TOKENS + [
+        r'"(?:\\.|[^"])*"',  # "string"
+        r"[{[\]}]",
+        r"</script>",
+    ]
+
+    # The values of the type attribute of <script> elements that
+    # contain JSON data.
+    TYPE_RE = re.compile(
+        r"\s*(?:application/(?:[\w.-]+\+)?json|importmap|speculationrules)\s*",
+        re.IGNORECASE,
+    )
+
+    def create_token(
+        self, raw_token: str, src: Source, line: Line
+    ) -> tuple[Token.BaseToken, "BaseMode"]:
+        mode: BaseMode = self
+
+        if raw_token in "{[":
+            token: Token.BaseToken = Token.Open(raw_token, mode=DjJSON)
+        elif raw_token in "]}":
+            token = Token.Close(raw_token, mode=DjJSON)
+        elif raw_token == "</script>":
+            token, mode = (
+                Token.Close(raw_token, mode=self.return_mode.__class__),
+                self.return_mode,
+            )
+        else:
+            token, mode = super().create_token(raw_token, src, line)
+
+        return token, mode
+
+
 # The following are "special" modes with different constructors.
 
 
@@ -557,23 +759,65 @@ class Comment(DjTXT):
 
     """
 
+    # Whether the tokenizer skips the whole comment at once, instead of
+    # calling create_token() for each line. Only disabled by the fuzzer
+    # to compare both.
+    SKIP_IN_BULK = True
+
     def __init__(
         self, endtag: str, *, mode: type[BaseMode], return_mode: BaseMode
     ) -> None:
         self.endtag = endtag
         self.mode = mode
         self.return_mode = return_mode
-        self.token_re = compile_re([r"\n", endtag])
+        self.token_re = compile_scanner([r"\n", endtag])
+        self.endtag_re = compile_re([endtag])
         self.extra_blocks = {}
         self.extra_middle_tags = []
 
     def create_token(
-        self, raw_token: str, src: str, line: Line
+        self, raw_token: str, src: Source, line: Line
     ) -> tuple[Token.BaseToken, "BaseMode"]:
         if re.match(self.endtag, raw_token):
             return Token.Close(raw_token, mode=self.mode, ignore=True), self.return_mode
         return Token.Text(raw_token, mode=Comment, ignore=True), self
 
+    def skip(
+        self, text: str, pos: int, line: Line, lines: list[Line]
+    ) -> tuple[Line, int, BaseMode]:
+        """
+        Create the tokens for the rest of the comment in one go,
+        instead of one raw token at a time. The comment's lines are
+        appended to lines, and the current line, the position after
+        the end tag and the next mode are returned.
+
+        The result is exactly the same as that of calling
+        create_token() for each line and the end tag.
+
+        """
+        endtag = self.endtag_re.search(text, pos)
+        end = endtag.start() if endtag else len(text)
+        *complete_lines, last_line = text[pos:end].split("\n")
+
+        for comment in complete_lines:
+            if len(comment) > self.MAX_LINE_LENGTH:
+                raise MaxLineLengthExceeded
+            if comment:
+                line.append(Token.Text(comment, mode=Comment, ignore=True))
+            lines.append(line)
+            line = Line()
+
+        last_line_start = end - len(last_line)
+        if text.find("\n", last_line_start) - last_line_start > self.MAX_LINE_LENGTH:
+            raise MaxLineLengthExceeded
+        if last_line:
+            line.append(Token.Text(last_line, mode=Comment, ignore=True))
+
+        if not endtag:
+            return line, len(text), self
+        line.append(Token.Close(endtag.group(), mode=self.mode, ignore=True))
+        return line, endtag.end(), self.return_mode
+
 
 class InsideHTMLTag(DjTXT):
     """
@@ -597,14 +841,16 @@ class InsideHTMLTag(DjTXT):
         self.return_mode = return_mode
         self.absolute = absolute
         self.offsets = offsets
-        self.token_re = compile_re(self.RAW_TOKENS)
+        self.token_re = compile_scanner(self.RAW_TOKENS)
         self.inside_attr = False
+        self.attribute = ""
+        self.data = False
         self.additional_offset = -len(tagname) - 1 if absolute else 0
         self.extra_blocks = {}
         self.extra_middle_tags = []
 
     def create_token(
-        self, raw_token: str, src: str, line: Line
+        self, raw_token: str, src: Source, line: Line
     ) -> tuple[Token.BaseToken, "BaseMode"]:
         mode: BaseMode = self
 
@@ -614,6 +860,12 @@ class InsideHTMLTag(DjTXT):
 
         if "text/template" in raw_token:
             self.tagname = ""
+        elif (
+            self.tagname == "script"
+            and self.attribute == "type"
+            and DjJSON.TYPE_RE.fullmatch(raw_token)
+        ):
+            self.data = True
 
         if raw_token in ['"', "'"]:
             if self.inside_attr:
@@ -640,6 +892,14 @@ class InsideHTMLTag(DjTXT):
                 token, mode = Token.Open(raw_token, mode=DjHTML), DjCSS(
                     return_mode=self.return_mode
                 )
+            elif self.tagname == "script" and self.data:
+                token = Token.Open(raw_token, mode=DjHTML)
+                if self.return_mode.ignore_data:
+                    mode = Comment(
+                        "</script>", mode=DjHTML, return_mode=self.return_mode
+                    )
+                else:
+                    mode = DjJSON(return_mode=self.return_mode)
             elif self.tagname == "script":
                 token, mode = Token.Open(raw_token, mode=DjHTML), DjJS(
                     return_mode=self.return_mode
@@ -654,12 +914,332 @@ class InsideHTMLTag(DjTXT):
         else:
             token, mode = super().create_token(raw_token, src, line)
 
+        # Remember the name of the attribute whose value comes next,
+        # until the end of that value.
+        if not self.inside_attr:
+            self.attribute = raw_token[:-1].lower() if raw_token.endswith("=") else ""
+
         return token, mode
 
 
+class Source:
+    """
+    The source text together with the position of the tokenizer.
+
+    Modes can look ahead in the remainder of the source with the
+    methods below, which saves the tokenizer from having to make a
+    copy of the remainder for every single token.
+
+    """
+
+    def __init__(self, text: str, pos: int = 0) -> None:
+        self.text = text
+        self.pos = pos
+        self.searches: dict[str, tuple[int, re.Match[str] | None]] = {}
+
+    def startswith(self, prefix: str) -> bool:
+        return self.text.startswith(prefix, self.pos)
+
+    def match(self, pattern: str) -> re.Match[str] | None:
+        return re.compile(pattern).match(self.text, self.pos)
+
+    def search(self, pattern: str) -> re.Match[str] | None:
+        """
+        Search the remainder of the source. Because the position only
+        moves forward, previous results can often be reused, which
+        prevents searching until the end of the source over and over
+        for tags that are never closed.
+
+        """
+        if pattern in self.searches:
+            pos, match = self.searches[pattern]
+            if pos <= self.pos and (not match or match.start() >= self.pos):
+                return match
+        match = re.compile(pattern).search(self.text, self.pos)
+        self.searches[pattern] = (self.pos, match)
+        return match
+
+
 class MaxLineLengthExceeded(Exception):
     pass
 
 
+def _trace(mode: BaseMode, hooks: Hooks) -> None:
+    """
+    Instrument a mode instance, so that the hooks are called for each
+    token it creates and each mode it switches to. The modes that are
+    switched to are instrumented in turn.
+
+    """
+    if "create_token" in vars(mode):
+        return
+    create_token = mode.create_token
+
+    def traced_create_token(
+        raw_token: str, src: Source, line: Line
+    ) -> tuple[Token.BaseToken, BaseMode]:
+        token, next_mode = create_token(raw_token, src, line)
+        hooks.token_created(token, mode)
+        if next_mode is not mode:
+            _trace(next_mode, hooks)
+            hooks.mode_switched(mode, next_mode)
+        return token, next_mode
+
+    mode.create_token = traced_create_token  # type: ignore[method-assign]
+
+    if isinstance(mode, Comment):
+        skip = mode.skip
+
+        def traced_skip(
+            text: str, pos: int, line: Line, lines: list[Line]
+        ) -> tuple[Line, int, BaseMode]:
+            first_line, first_token = len(lines), len(line.tokens)
+            next_line, pos, next_mode = skip(text, pos, line, lines)
+            # The current line is the first of the appended lines, if
+            # any, and the next line is new unless no line was appended.
+            new_lines = lines[first_line + 1 :]
+            if next_line is not line:
+                new_lines.append(next_line)
+            for token in line.tokens[first_token:]:
+                hooks.token_created(token, mode)
+            for new_line in new_lines:
+                for token in new_line.tokens:
+                    hooks.token_created(token, mode)
+            if next_mode is not mode:
+                _trace(next_mode, hooks)
+                hooks.mode_switched(mode, next_mode)
+            return next_line, pos, next_mode
+
+        mode.skip = traced_skip  # type: ignore[method-assign]
+
+
+class _TracedStack(list["Token.BaseToken"]):
+    """
+    The parser's stack, calling the hooks on each push and pop.
+
+    """
+
+    def __init__(self, hooks: Hooks) -> None:
+        self.hooks = hooks
+
+    def append(self, token: Token.BaseToken) -> None:
+        super().append(token)
+        self.hooks.pushed(token, self)
+
+    def pop(self, index: SupportsIndex = -1) -> Token.BaseToken:
+        token = super().pop(index)
+        self.hooks.popped(token, self)
+        return token
+
+
+class _DepthRecorder(list["Token.BaseToken"]):
+    """
+    The tokens of a line, recording the depth of the parser's stack
+    after each token while the parser iterates over them.
+
+    """
+
+    def __init__(
+        self, tokens: list[Token.BaseToken], stack: list[Token.BaseToken]
+    ) -> None:
+        super().__init__(tokens)
+        self.stack = stack
+        self.depths: list[int] = []
+
+    def __iter__(self) -> Iterator[Token.BaseToken]:
+        for token in super().__iter__():
+            yield token
+            self.depths.append(len(self.stack))
+
+
+def _finalize_lines(lines: Iterable[Line], hooks: Hooks) -> Iterator[Line]:
+    """
+    Yield the lines to the parser, calling the hooks once the parser
+    is done with each line.
+
+    """
+    for line in lines:
+        yield line
+        hooks.line_finalized(line)
+
+
+_compiled_res: dict[tuple[str, ...], re.Pattern[str]] = {}
+_compiled_scanners: dict[tuple[str, ...], re.Pattern[str] | Scanner] = {}
+
+
 def compile_re(raw_tokens: Sequence[str]) -> re.Pattern[str]:
-    return re.compile("(" + "|".join(raw_tokens) + ")")
+    """
+    Compile the raw tokens of a mode into a single regex. This is
+    done when a mode is first instantiated, so that only the regexes
+    of the modes that are actually encountered get compiled. The
+    result is cached because some modes, like InsideHTMLTag, are
+    instantiated many times.
+
+    """
+    key = tuple(raw_tokens)
+    if (pattern := _compiled_res.get(key)) is None:
+        pattern = re.compile("(" + "|".join(raw_tokens) + ")")
+        # Threads that compile the same regex at the same time all get
+        # the one that was cached first.
+        pattern = _compiled_res.setdefault(key, pattern)
+    return pattern
+
+
+def compile_scanner(raw_tokens: Sequence[str]) -> re.Pattern[str] | Scanner:
+    """
+    Like compile_re(), but return a Scanner when searching for the
+    raw tokens can be sped up with a prefilter. When every raw token
+    starts with a literal character, or can be rewritten to, re already
+    skips ahead to the next one of those characters by itself, so then
+    a regex is returned instead.
+
+    """
+    key = tuple(raw_tokens)
+    if (scanner := _compiled_scanners.get(key)) is None:
+        alternatives = [_alternatives(raw_token) for raw_token in raw_tokens]
+        if all(alternatives):
+            scanner = compile_re(sum(alternatives, []))
+        else:
+            scanner = Scanner.create(raw_tokens) or compile_re(raw_tokens)
+        scanner = _compiled_scanners.setdefault(key, scanner)
+    return scanner
+
+
+# A literal character in a regex that isn't followed by a quantifier.
+_LITERAL = r"(?:\\n|\\([^\w])|([^\\.^$*+?{}\[\]|()]|[{}](?!\d)))(?![?*+]|{\d)"
+
+# A character class in a regex, like [{()}] or [\w-].
+_CLASS = r"\[((?:\\.|[^\\\]])+)\]"
+
+
+def _alternatives(raw_token: str) -> list[str]:
+    """
+    Rewrite a raw token as alternatives that each start with a literal
+    character, like "/?>" as "/>" and ">", or return an empty list if
+    that isn't possible as far as this function knows.
+
+    """
+    if re.match(_LITERAL, raw_token):
+        return [raw_token]
+
+    # An optional character, like the slash in "/?>".
+    if match := re.match(r"(\\[^\w]|[^\\.^$*+?{}\[\]|()])\?", raw_token):
+        if rest := _alternatives(raw_token[match.end() :]):
+            return [match[1] + alternative for alternative in rest] + rest
+
+    # A class of literal characters, like "[{()}]".
+    if (match := re.match(_CLASS, raw_token)) and not re.match(
+        r"[?*+{]", raw_token[match.end() :]
+    ):
+        chars = re.findall(r"\\([^\w])|([^\\^-])|(.)", match[1])
+        if all(not other for _, _, other in chars):
+            return [
+                re.escape(escaped or char) + raw_token[match.end() :]
+                for escaped, char, _ in chars
+            ]
+
+    return []
+
+
+def _literal_prefix(raw_token: str) -> str:
+    """
+    Return the literal characters at the start of a raw token.
+
+    """
+    prefix = ""
+    pos = 0
+    while match := re.compile(_LITERAL).match(raw_token, pos):
+        prefix += "\n" if match[0] == r"\n" else match[1] or match[2]
+        pos = match.end()
+    return prefix
+
+
+class Scanner:
+    """
+    Search for the raw tokens of a mode like re.Pattern.search(), but
+    skip the plain text in between at C speed.
+
+    The re module tries every alternative of a regex at every position,
+    unless all of them start with a literal character, so long runs of
+    plain text and attribute values are costly to search. That is why
+    the prefilter only consists of the raw tokens that start with a
+    literal character, which re skips ahead to by itself.
+
+    At most one raw token may start with a run of characters from a
+    class instead, like the property names in CSS. Because those can
+    start nearly anywhere, the prefilter looks for their literal suffix,
+    like ": ", and the full regex is tried at the start of the run of
+    characters before it. This is also done when a raw token is found
+    inside such a run, like the "var " in "myvar: 1".
+
+    """
+
+    def __init__(
+        self, alternatives: list[str], run: str | None = None, suffix: str = ""
+    ) -> None:
+        self.pattern = compile_re(alternatives)
+        self.run_start: re.Pattern[str] | None = None
+        inside = []
+        outside = []
+        for alternative in alternatives:
+            if not (prefix := _literal_prefix(alternative)):
+                continue
+            elif run and re.match(run, prefix):
+                inside.append(alternative)
+            else:
+                outside.append(alternative)
+
+        # Candidates that involve the run come first and end with an
+        # empty group, so that they can be told apart by the lastindex
+        # of the match.
+        prefilter = []
+        if run:
+            escaped = re.escape(suffix)
+            prefilter.append(f"{escaped}(?<={run}{escaped})()")
+            prefilter += [alternative + "()" for alternative in inside]
+            negated = "[" + run[2:] if run.startswith("[^") else "[^" + run[1:]
+            self.run_start = re.compile(f"(?s:.*){negated}")
+        prefilter += outside
+        self.prefilter = re.compile("|".join(prefilter))
+
+    @classmethod
+    def create(cls, raw_tokens: Sequence[str]) -> Scanner | None:
+        """
+        Analyze the raw tokens, or return None if they don't all start
+        with a literal character, except for a single run.
+
+        """
+        alternatives: list[str] = []
+        run = None
+        suffix = ""
+        for raw_token in raw_tokens:
+            if re.compile(raw_token).groups:
+                return None
+            if rewritten := _alternatives(raw_token):
+                alternatives += rewritten
+            elif (
+                not run
+                and (match := re.match(_CLASS + r"\+", raw_token))
+                and (suffix := _literal_prefix(raw_token[match.end() :]))
+            ):
+                run = match[0][:-1]
+                alternatives.append(raw_token)
+            else:
+                return None
+        return cls(alternatives, run, suffix)
+
+    def search(self, text: str, pos: int = 0) -> re.Match[str] | None:
+        while candidate := self.prefilter.search(text, pos):
+            if not candidate.lastindex:
+                return candidate
+            start = candidate.start()
+            if self.run_start:
+                # Try the start of the run of characters first.
+                run = self.run_start.match(text, pos, start)
+                run_start = run.end() if run else pos
+                if run_start < start and (match := self.pattern.match(text, run_start)):
+                    return match
+            if match := self.pattern.match(text, start):
+                return match
+            pos = start + 1
+        return None
@@ -8,7 +8,28 @@ Options set by command-line arguments. Usage:
 
 import argparse
 import sys
-from importlib.metadata import version
+
+
+def count(value: str) -> int:
+    number = int(value)
+    if number < 0:
+        raise ValueError
+    return number
+
+
+def shard(value: str) -> tuple[int, int]:
+    index, count = map(int, value.split("/"))
+    if not 1 <= index <= count:
+        raise ValueError
+    return index, count
+
+
+def suffix(value: str) -> tuple[str, str]:
+    extension, mode = value.split("=")
+    if not extension.startswith("."):
+        raise ValueError
+    return extension, mode
+
 
 parser = argparse.ArgumentParser(
     description=(
@@ -65,13 +86,79 @@ parser.add_argument(
     help="startblock[,middletag,...],endblock tuple",
     type=lambda x: tuple(x.split(",")),
 )
+parser.add_argument(
+    "-a",
+    "--all-languages",
+    action="store_true",
+    help="indent html, css, js and txt files according to their extension",
+)
+parser.add_argument(
+    "--extra-suffix",
+    metavar=".EXT=MODE",
+    action="append",
+    type=suffix,
+    help="indent files with this extension in the given mode (html, css, js or txt)",
+)
+parser.add_argument(
+    "--ignore-data",
+    action="store_true",
+    help="leave JSON data in <script> elements untouched",
+)
+parser.add_argument(
+    "-e",
+    "--encoding",
+    default="utf-8",
+    help="encoding of the templates (the default is utf-8)",
+)
+parser.add_argument(
+    "--threads",
+    metavar="N",
+    type=count,
+    default=0,
+    help="indent N files at the same time in threads",
+)
+parser.add_argument(
+    "--io-threads",
+    metavar="N",
+    type=count,
+    default=0,
+    help="read and write files in N background threads",
+)
+parser.add_argument(
+    "--shard",
+    metavar="I/N",
+    type=shard,
+    help="only indent the I-th of N equally sized parts of the files",
+)
+parser.add_argument(
+    "--report",
+    choices=["json"],
+    help="print a machine-readable report to stdout",
+)
+parser.add_argument(
+    "--emit-edits",
+    choices=["json"],
+    help="print the indentation changes to stdout instead of writing files",
+)
+parser.add_argument(
+    "--record-shape",
+    metavar="FILE",
+    help="save an anonymized copy of the template to FILE for bug reports",
+)
+parser.add_argument(
+    "--stdin-batch",
+    action="store_true",
+    help="indent a stream of NUL-delimited templates from standard input",
+)
 
 options = parser.parse_args()
 
 if options.show_version:
+    from importlib.metadata import version
+
     print(version("djhtml"))
     sys.exit()
-elif options.show_help or not options.input_filenames:
+elif options.show_help or not (options.input_filenames or options.stdin_batch):
     parser.print_help()
     sys.exit()
 elif options.in_place:
@@ -0,0 +1,126 @@
+"""
+Overlap reading and writing files with indenting them. Usage:
+
+    with Writer(threads=4) as writer:
+        for filename, read in prefetch(filenames, read_file, threads=4):
+            source = read()
+            result = indent(source)
+            writer.put(functools.partial(write_file, filename, result))
+
+Files are read by a pool of threads ahead of the calling thread, and
+written by a single thread behind it, while the calling thread does
+the actual work. Both happen in the original order of the files, and
+at most a few files per thread are kept in memory. With zero threads,
+everything simply happens in the calling thread.
+
+"""
+
+from __future__ import annotations
+
+import functools
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+    from typing import TypeVar
+
+    T = TypeVar("T")
+    R = TypeVar("R")
+
+# The number of files per thread that can be waiting to be processed
+# or written.
+FILES_PER_THREAD = 2
+
+
+def prefetch(
+    items: Iterable[T], function: Callable[[T], R], threads: int
+) -> Iterator[tuple[T, Callable[[], R]]]:
+    """
+    Yield each item together with a function that returns the result
+    of function(item), which is computed ahead of time by a pool of
+    threads. Exceptions are raised by the returned function.
+
+    """
+    if not threads:
+        for item in items:
+            yield item, functools.partial(function, item)
+        return
+
+    from collections import deque
+    from concurrent.futures import ThreadPoolExecutor
+
+    remaining = iter(items)
+    executor = ThreadPoolExecutor(threads)
+    exhausted = False
+    try:
+        futures = deque(
+            (item, executor.submit(function, item))
+            for _, item in zip(range(threads * FILES_PER_THREAD), remaining)
+        )
+        while futures:
+            item, future = futures.popleft()
+            for next_item in remaining:
+                futures.append((next_item, executor.submit(function, next_item)))
+                break
+            yield item, future.result
+        exhausted = True
+    finally:
+        # The results that were yielded may not have been computed yet
+        # when the consumer runs ahead, as when prefetching from another
+        # prefetch(), so they are only cancelled when the consumer stops
+        # early or fails.
+        if exhausted:
+            executor.shutdown(wait=False)
+        else:
+            executor.shutdown(cancel_futures=True)
+
+
+class Writer:
+    """
+    A thread that calls functions one by one in the order in which
+    they were put. When a function raises an exception, the remaining
+    functions are skipped and the exception is raised again by the
+    next call to put() or when leaving the context.
+
+    """
+
+    def __init__(self, threads: int) -> None:
+        self.background = bool(threads)
+        self.error: BaseException | None = None
+        if self.background:
+            import queue
+            import threading
+
+            self.queue: queue.Queue[Callable[[], object] | None] = queue.Queue(
+                threads * FILES_PER_THREAD
+            )
+            self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self) -> Writer:
+        if self.background:
+            self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self.background:
+            self.queue.put(None)
+            self.thread.join()
+        if self.error and not exc_info[0]:
+            raise self.error
+
+    def put(self, function: Callable[[], object]) -> None:
+        if self.error:
+            raise self.error
+        if self.background:
+            self.queue.put(function)
+        else:
+            function()
+
+    def _run(self) -> None:
+        while function := self.queue.get():
+            if not self.error:
+                try:
+                    function()
+                except BaseException as e:
+                    self.error = e
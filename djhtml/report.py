@@ -0,0 +1,199 @@
+"""
+The outcome of indenting a number of templates. Reports can be
+written as JSON, which makes it possible to split the work across
+multiple machines and combine the results afterwards:
+
+    $ djhtml --check --shard 1/2 --report json . > shard1.json
+    $ djhtml --check --shard 2/2 --report json . > shard2.json
+    $ djhtml-merge-reports shard1.json shard2.json
+
+"""
+
+from __future__ import annotations
+
+import sys
+
+CHANGED = "changed"
+UNCHANGED = "unchanged"
+ERROR = "error"
+SKIPPED = "skipped"
+STATUSES = [CHANGED, UNCHANGED, ERROR, SKIPPED]
+
+
+class Report:
+    """
+    The status and processing time of each template.
+
+    """
+
+    def __init__(self, check: bool = False, shard: str | None = None) -> None:
+        self.check = check
+        self.shard = shard
+        self.results: dict[str, tuple[str, float]] = {}
+
+    def add(self, filename: str, status: str, duration: float = 0.0) -> None:
+        """
+        Record the result of a single template. A template that was
+        skipped never overrides a result from another report.
+
+        """
+        if status == SKIPPED and filename in self.results:
+            return
+        self.results[filename] = (status, duration)
+
+    @property
+    def counts(self) -> dict[str, int]:
+        """
+        The number of templates for each status.
+
+        """
+        counts = dict.fromkeys(STATUSES, 0)
+        for status, _ in self.results.values():
+            counts[status] += 1
+        return counts
+
+    @property
+    def exit_status(self) -> int:
+        """
+        123 when there were errors, 1 when templates would have been
+        reindented while checking, and 0 otherwise.
+
+        """
+        counts = self.counts
+        if counts[ERROR]:
+            return 123
+        if self.check and counts[CHANGED]:
+            return 1
+        return 0
+
+    def summarize(self) -> None:
+        """
+        Print a human readable summary to stderr.
+
+        """
+        counts = self.counts
+        changed_files = counts[CHANGED]
+        unchanged_files = counts[UNCHANGED]
+        problematic_files = counts[ERROR]
+        skipped_files = counts[SKIPPED]
+
+        s = "s" if changed_files != 1 else ""
+        have = "would have" if self.check else "have" if s else "has"
+        _info(f"{changed_files} template{s} {have} been reindented.")
+        if unchanged_files:
+            s = "s" if unchanged_files != 1 else ""
+            were = "were" if s else "was"
+            _info(f"{unchanged_files} template{s} {were} already perfect!")
+        if problematic_files:
+            s = "s" if problematic_files != 1 else ""
+            _info(
+                f"{problematic_files} template{s} could not be processed"
+                " due to an error."
+            )
+        if skipped_files:
+            s = "s" if skipped_files != 1 else ""
+            were = "were" if s else "was"
+            _info(f"{skipped_files} template{s} {were} skipped.")
+
+    def to_json(self) -> str:
+        import json
+
+        return json.dumps(
+            {
+                "check": self.check,
+                "shard": self.shard,
+                "files": [
+                    {"filename": filename, "status": status, "duration": duration}
+                    for filename, (status, duration) in self.results.items()
+                ],
+                "summary": self.counts,
+            },
+            indent=2,
+        )
+
+    @classmethod
+    def from_json(cls, text: str) -> Report:
+        import json
+
+        data = json.loads(text)
+        report = cls(check=data["check"], shard=data["shard"])
+        for result in data["files"]:
+            report.add(result["filename"], result["status"], result["duration"])
+        return report
+
+    @classmethod
+    def merge(cls, reports: list[Report]) -> Report:
+        """
+        Combine the reports of different shards into one. Raise a
+        ValueError unless the reports are of the shards 1/N to N/N,
+        each exactly once.
+
+        """
+        shards = []
+        for report in reports:
+            if not report.shard:
+                raise ValueError("one of the reports is not of a shard")
+            index, count = map(int, report.shard.split("/"))
+            shards.append((index, count))
+        counts = {count for _, count in shards}
+        if len(counts) != 1:
+            raise ValueError("the reports are of different numbers of shards")
+        count = counts.pop()
+        indexes = [index for index, _ in shards]
+        for index in range(1, count + 1):
+            if indexes.count(index) != 1:
+                problem = "duplicate" if index in indexes else "missing"
+                raise ValueError(f"{problem} shard {index}/{count}")
+        if len(indexes) != count:
+            raise ValueError(f"invalid shard of {count}")
+
+        merged = cls(check=any(report.check for report in reports))
+        for report in reports:
+            for filename, (status, duration) in report.results.items():
+                merged.add(filename, status, duration)
+        return merged
+
+
+def main() -> None:
+    """
+    Entrypoint for the djhtml-merge-reports command.
+
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Combine the JSON reports of sharded DjHTML runs."
+    )
+    parser.add_argument(
+        "reports", metavar="REPORT", nargs="+", help="JSON report file(s)"
+    )
+    parser.add_argument(
+        "-o", "--output", metavar="FILE", help="write the merged report to FILE"
+    )
+    args = parser.parse_args()
+
+    reports = []
+    for filename in args.reports:
+        try:
+            with open(filename) as f:
+                reports.append(Report.from_json(f.read()))
+        except (OSError, ValueError, KeyError) as e:
+            sys.exit(f"Error: could not read report {filename}: {e}")
+
+    try:
+        merged = Report.merge(reports)
+    except ValueError as e:
+        sys.exit(f"Error: {e}")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(merged.to_json() + "\n")
+    merged.summarize()
+    sys.exit(merged.exit_status)
+
+
+def _info(msg: str) -> None:
+    print(msg, file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
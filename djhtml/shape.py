@@ -0,0 +1,168 @@
+"""
+Anonymized copies of templates, which keep everything that matters to
+the tokenizer and the parser but none of the text. This makes it
+possible to report that a template is indented slowly or strangely
+without sharing the template itself:
+
+    $ djhtml --check --record-shape slow.shape.html slow.html
+    $ djhtml-bench tokenize slow.shape.html
+
+Letters are replaced with "x" or "X" and digits with "0". The template
+is tokenized first, so that only the names of tags and the few words
+that affect the indentation are kept, and only where the tokenizer
+looks at them. Whitespace and punctuation are kept as they are, so the
+copy has the same length, newlines, string delimiters and nesting as
+the original.
+
+"""
+
+from __future__ import annotations
+
+import re
+
+from .modes import DjHTML, DjJS, DjTXT, InsideHTMLTag
+from .tokens import Token
+
+TYPE_CHECKING = False
+
+if TYPE_CHECKING:
+    from .lines import Line
+    from .modes import BaseMode
+
+# The parts of tokens that are copied as they are, in any mode.
+TEMPLATE_TAG_RE = re.compile(r"{%[-+]? *[#/]?\w+|\bfmt:o(?:n|ff)\b")
+
+# In template tags: {% video as %}, {% placeholder or %}
+AMBIGUOUS_RE = re.compile(r"\b(?:as|or)\b")
+
+# Inside HTML tags.
+TAGNAME_RE = re.compile(r"[\w\-.:]+")
+TYPE_ATTRIBUTE_RE = re.compile(r"(?i:type)=")
+TEMPLATE_RE = re.compile(r"text/template")
+
+# In JavaScript.
+JS_KEYWORDS = ["var ", "let ", "const ", "if", "else", "for", "while"]
+CASE_RE = re.compile(r"^\s*case |default:\s*$")
+
+LETTER_RE = re.compile(r"[^\W\d_]")
+DIGIT_RE = re.compile(r"\d")
+
+
+def anonymize(mode: BaseMode) -> str:
+    """
+    Return a copy of the source of the mode, which must not have been
+    tokenized yet, in which all text has been replaced with filler of
+    the same length. When the source can't be tokenized, nothing but
+    the whitespace and the punctuation is kept.
+
+    """
+    try:
+        lines = list(mode.tokenize_lines())
+    except Exception:
+        return _fill(mode.source)
+
+    result = []
+    previous = before_previous = None
+    for line in lines:
+        for token in line.tokens:
+            result.append(_anonymize_token(token, previous, before_previous))
+            previous, before_previous = token, previous
+        result.append("\n")
+    return "".join(result[:-1])
+
+
+def signature(lines: list[Line]) -> list[tuple[object, ...]]:
+    """
+    Return the indentation and the type, mode and length of each token
+    of each line, which should be the same for a template and its
+    anonymized copy.
+
+    """
+    return [
+        (line.level, line.offset)
+        + tuple(
+            (type(token).__name__, token.mode.__name__, len(token.text))
+            for token in line.tokens
+        )
+        for line in lines
+    ]
+
+
+def first_difference(lines: list[Line], other_lines: list[Line]) -> int | None:
+    """
+    Return the number of the first line where the signatures differ,
+    or None when they are identical.
+
+    """
+    signatures = signature(lines)
+    other_signatures = signature(other_lines)
+    for nr, (a, b) in enumerate(zip(signatures, other_signatures), start=1):
+        if a != b:
+            return nr
+    if len(signatures) != len(other_signatures):
+        return min(len(signatures), len(other_signatures)) + 1
+    return None
+
+
+def _anonymize_token(
+    token: Token.BaseToken,
+    previous: Token.BaseToken | None,
+    before_previous: Token.BaseToken | None,
+) -> str:
+    """
+    Return the text of the token with everything replaced except the
+    parts that the tokenizer depends on in the token's mode.
+
+    """
+    text = token.text
+    keep = [match.span() for match in TEMPLATE_TAG_RE.finditer(text)]
+
+    if text.startswith("</") and (
+        token.mode is DjHTML or isinstance(token, Token.Close)
+    ):
+        # A closing tag, including </style> and </script>.
+        if match := re.search(r"\w+", text):
+            keep.append(match.span())
+
+    elif token.mode is DjHTML and text.startswith("<pre"):
+        keep.append((0, 4))
+
+    elif token.mode is DjTXT and text.startswith("{%"):
+        keep += [match.span() for match in AMBIGUOUS_RE.finditer(text)]
+
+    elif token.mode is InsideHTMLTag:
+        if _is(previous, DjHTML, "<") and (match := TAGNAME_RE.match(text)):
+            # The name of the tag that was just opened.
+            keep.append(match.span())
+        elif TYPE_ATTRIBUTE_RE.fullmatch(text) or _is(previous, InsideHTMLTag, "type="):
+            keep.append((0, len(text)))
+        elif _is(previous, InsideHTMLTag, '"', "'") and _is(
+            before_previous, InsideHTMLTag, "type="
+        ):
+            keep.append((0, len(text)))
+        keep += [match.span() for match in TEMPLATE_RE.finditer(text)]
+
+    elif token.mode is DjJS:
+        if text in JS_KEYWORDS:
+            keep.append((0, len(text)))
+        keep += [match.span() for match in CASE_RE.finditer(text)]
+
+    result = []
+    pos = 0
+    for start, end in sorted(keep):
+        if start > pos:
+            result.append(_fill(text[pos:start]))
+        if end > pos:
+            result.append(text[max(start, pos) : end])
+            pos = end
+    result.append(_fill(text[pos:]))
+    return "".join(result)
+
+
+def _is(token: Token.BaseToken | None, mode: type[BaseMode], *texts: str) -> bool:
+    return token is not None and token.mode is mode and token.text.lower() in texts
+
+
+def _fill(text: str) -> str:
+    text = LETTER_RE.sub(lambda m: "X" if m.group().isupper() else "x", text)
+    return DIGIT_RE.sub("0", text)
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+TYPE_CHECKING = False
 
 if TYPE_CHECKING:
     from .modes import BaseMode
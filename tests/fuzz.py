@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+"""
+Differential fuzzer for the tokenizer and parser. Usage:
+
+    $ python -m tests.fuzz --count 1000 --seed 42
+
+Random templates are generated from a small grammar of HTML, CSS,
+JavaScript and Django/Jinja constructs, which are often left
+unbalanced or unterminated. Each template is indented by a reference
+engine with all shortcuts disabled, and the result is compared to
+that of each optimized path. The reference result itself must not
+change anything but whitespace. With --idempotence, indenting it
+again must not change it at all either.
+
+Failing templates are minimized and written to the suite/fuzz
+directory, where they are replayed by test_fuzz.py with the same
+checks.
+
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import hashlib
+import random
+import re
+import sys
+from collections.abc import Callable, Iterator
+from pathlib import Path
+from typing import Any
+from unittest import mock
+
+from djhtml.document import Document
+from djhtml.hooks import Hooks
+from djhtml.lines import Line
+from djhtml.modes import (
+    BaseMode,
+    Comment,
+    DjCSS,
+    DjHTML,
+    DjJS,
+    DjTXT,
+    MaxLineLengthExceeded,
+    Scanner,
+    Source,
+)
+
+FUZZ_DIR = Path(__file__).parent / "suite" / "fuzz"
+MODES: dict[str, type[BaseMode]] = {
+    "html": DjHTML,
+    "css": DjCSS,
+    "js": DjJS,
+    "txt": DjTXT,
+}
+EXTRA: dict[str, Any] = {
+    "extra_blocks": {"weird_tag": "endweird"},
+    "extra_middle_tags": ["weird"],
+}
+TABWIDTHS = [4, 2]
+
+# The result of indenting a template: the token dump and the output
+# for each tabwidth, or the name of the exception that was raised.
+Result = tuple[str, ...]
+NodeFactory = Callable[[int], str]
+Engine = Callable[[str, type[BaseMode]], Result]
+
+
+class Generator:
+    """
+    Generate random templates from a grammar.
+
+    """
+
+    WORDS = ["foo", "bar", "x", "{", "}", "(", ")", "[", "]", "<", ">", ";", ",", "'"]
+    TAGS = ["div", "p", "span", "ul", "li", "a", "table", "td", "svg", "DIV"]
+    VOID_TAGS = ["br", "img", "input", "hr", "meta"]
+
+    def __init__(self, seed: int) -> None:
+        self.rng = random.Random(seed)
+
+    def template(self) -> str:
+        text = self.nodes(self.html, depth=0)
+        return self.reindent(text)
+
+    def chance(self, p: float) -> bool:
+        return self.rng.random() < p
+
+    def choice(self, *options: str) -> str:
+        return self.rng.choice(options)
+
+    def sep(self) -> str:
+        return self.choice("\n", "\n", "\n", " ", "", "\n\n", "\t")
+
+    def nodes(self, node: NodeFactory, depth: int) -> str:
+        count = self.rng.randint(0, 4 if depth < 3 else 1)
+        return "".join(node(depth + 1) + self.sep() for _ in range(count))
+
+    def text(self, depth: int = 0) -> str:
+        return " ".join(self.rng.choices(self.WORDS, k=self.rng.randint(1, 4)))
+
+    def reindent(self, text: str) -> str:
+        """
+        Randomly mess up the indentation.
+
+        """
+        lines = text.split("\n")
+        for i, line in enumerate(lines):
+            if self.chance(0.7):
+                lines[i] = self.choice("", " ", "  ", "\t", "        ") + line.lstrip()
+        return "\n".join(lines)
+
+    def django(self, inner: NodeFactory, depth: int) -> str:
+        kind = self.rng.randrange(14)
+        dash = self.choice("", "", "-", "+")
+        if kind == 0:
+            parts = [f"{{%{dash} if x {dash}%}}", self.nodes(inner, depth)]
+            if self.chance(0.4):
+                parts += ["{% elif y %}", self.nodes(inner, depth)]
+            if self.chance(0.4):
+                parts += ["{% else %}", self.nodes(inner, depth)]
+            if self.chance(0.9):
+                parts.append(f"{{%{dash} endif {dash}%}}")
+            return self.sep().join(parts)
+        if kind == 1:
+            parts = ["{% for x in y %}", self.nodes(inner, depth)]
+            if self.chance(0.3):
+                parts += ["{% empty %}", self.nodes(inner, depth)]
+            if self.chance(0.9):
+                parts.append("{% endfor %}")
+            return self.sep().join(parts)
+        if kind == 2:
+            end = self.choice(
+                "{% endblock %}", "{% endblock content %}", "", "{% endif %}"
+            )
+            return self.sep().join(
+                ["{% block content %}", self.nodes(inner, depth), end]
+            )
+        if kind == 3:
+            end = self.choice("{% endcomment %}", "{%endcomment%}", "")
+            return self.sep().join(["{% comment %}", self.nodes(self.html, depth), end])
+        if kind == 4:
+            tag = self.choice("verbatim", "raw")
+            end = self.choice(f"{{% end{tag} %}}", "")
+            return self.sep().join([f"{{% {tag} %}}", self.nodes(inner, depth), end])
+        if kind == 5:
+            return "{# " + self.text() + self.choice(" #}", " #}", "")
+        if kind == 6:
+            end = self.choice("{# fmt:on #}", "")
+            return self.sep().join(["{# fmt:off #}", self.nodes(inner, depth), end])
+        if kind == 7:
+            return "{{ " + self.choice("x", "x|y:'}'", "{'a': 1}") + " }}"
+        if kind == 8:
+            if self.chance(0.5):
+                return "{% set x = 1 %}"
+            return self.sep().join(
+                ["{% set x %}", self.nodes(inner, depth), "{% endset %}"]
+            )
+        if kind == 9:
+            return self.sep().join(
+                [
+                    "{% weird_tag %}",
+                    self.nodes(inner, depth),
+                    "{% weird %}",
+                    self.nodes(inner, depth),
+                    self.choice("{% endweird %}", ""),
+                ]
+            )
+        if kind == 10:
+            return self.sep().join(
+                [
+                    "{% blocktrans count n=x %}",
+                    self.text(),
+                    "{% plural %}",
+                    self.text(),
+                    "{% endblocktrans %}",
+                ]
+            )
+        if kind == 11:
+            return self.choice("{% endif %}", "{% else %}", "{% endfor %}", "{% end %}")
+        if kind == 12:
+            return self.choice("{% load static %}", "{% url 'a' %}", "{% csrf_token %}")
+        return (
+            "{% with a=b %}" + self.sep() + self.nodes(inner, depth) + "{% endwith %}"
+        )
+
+    def html(self, depth: int) -> str:
+        kind = self.rng.randrange(12)
+        if kind < 3:
+            tag = self.rng.choice(self.TAGS)
+            parts = [self.start_tag(tag), self.nodes(self.html, depth)]
+            if self.chance(0.85):
+                parts.append(f"</{self.choice(tag, tag, tag, 'div')}>")
+            return self.sep().join(parts)
+        if kind == 3:
+            return self.start_tag(self.rng.choice(self.VOID_TAGS)) + self.choice(
+                "", "/>"
+            )
+        if kind == 4:
+            end = self.choice("-->", "-->", "")
+            return "<!--" + self.sep() + self.text() + self.sep() + end
+        if kind == 5:
+            end = self.choice("</pre>", "</PRE >", "")
+            return "<pre>" + self.sep() + self.nodes(self.html, depth) + end
+        if kind == 6:
+            end = self.choice("</style>", "</style>", "")
+            return self.sep().join(["<style>", self.nodes(self.css, depth), end])
+        if kind == 7:
+            attrs = self.choice("", ' type="module"', ' type="application/json"')
+            end = self.choice("</script>", "</script>", "")
+            return self.sep().join(
+                [f"<script{attrs}>", self.nodes(self.js, depth), end]
+            )
+        if kind == 8:
+            return self.django(self.html, depth)
+        if kind == 9:
+            return self.choice("</div>", "</p>", "<", ">", "<!DOCTYPE html>", "<?xml?>")
+        return self.text()
+
+    def start_tag(self, tag: str) -> str:
+        attrs = []
+        for _ in range(self.rng.randint(0, 3)):
+            value = self.choice(
+                '"x"', "'y'", '"{{ x }}"', '"{% if x %}a{% endif %}"', "z"
+            )
+            attrs.append(
+                self.choice("class=", "data-x=", "{% if x %}a{% endif %}") + value
+            )
+        sep = self.choice(" ", "\n", "\n  ")
+        close = self.choice(">", ">", "\n>", "")
+        return f"<{tag}" + "".join(sep + attr for attr in attrs) + close
+
+    def css(self, depth: int) -> str:
+        kind = self.rng.randrange(7)
+        if kind < 2:
+            parts = [self.choice("a {", "@media print {", "a, b {", "a{")]
+            parts.append(self.nodes(self.css, depth))
+            if self.chance(0.9):
+                parts.append("}")
+            return self.sep().join(parts)
+        if kind == 2:
+            return self.choice("color: red;", "margin: 0", "b: c;", "grid: 'a' 'b';")
+        if kind == 3:
+            return "/* " + self.text() + self.sep() + self.choice(" */", "")
+        if kind == 4:
+            return self.django(self.css, depth)
+        if kind == 5:
+            return self.choice("}", "{", "(", ")")
+        return "a: url(" + self.choice("x", "{{ x }}") + ");"
+
+    def js(self, depth: int) -> str:
+        kind = self.rng.randrange(11)
+        if kind < 2:
+            opening = self.choice("if (x) {", "function f() {", "x = {", "switch (x) {")
+            closing = self.choice("}", "};", "})")
+            parts = [opening, self.nodes(self.js, depth)]
+            if self.chance(0.9):
+                parts.append(closing)
+            return self.sep().join(parts)
+        if kind == 2:
+            return self.sep().join(["f(", self.nodes(self.js, depth), ");"])
+        if kind == 3:
+            return self.sep().join(["[", self.nodes(self.js, depth), "]"])
+        if kind == 4:
+            return self.choice("case 1:", "default:", "return x;", "break;")
+        if kind == 5:
+            return "// " + self.text()
+        if kind == 6:
+            return "/* " + self.text() + self.sep() + self.choice("*/", "")
+        if kind == 7:
+            return self.choice("'}'", '"{"', "`a\n{b}\n`", "/[}]/")
+        if kind == 8:
+            return self.django(self.js, depth)
+        if kind == 9:
+            return self.choice(", x", ", x = 1", "x,", ".then(", ")", "var x = 1;")
+        return self.text()
+
+
+@contextlib.contextmanager
+def reference_engine() -> Iterator[None]:
+    """
+    Disable the shortcuts of the tokenizer: comments are tokenized one
+    raw token at a time, lookahead results are never reused and raw
+    tokens are searched for without a prefilter.
+
+    """
+
+    def search(self: Source, pattern: str) -> re.Match[str] | None:
+        return re.compile(pattern).search(self.text, self.pos)
+
+    def scan(self: Scanner, text: str, pos: int = 0) -> re.Match[str] | None:
+        return self.pattern.search(text, pos)
+
+    with mock.patch.object(Comment, "SKIP_IN_BULK", False):
+        with mock.patch.object(Source, "search", search):
+            with mock.patch.object(Scanner, "search", scan):
+                yield
+
+
+def _result(mode: BaseMode) -> Result:
+    document = Document(mode.source, mode.lines)
+    return (document.debug(), *(document.indent(t) for t in TABWIDTHS))
+
+
+def _catch(func: Engine) -> Engine:
+    def wrapper(source: str, Mode: type[BaseMode]) -> Result:
+        try:
+            return func(source, Mode)
+        except MaxLineLengthExceeded:
+            return ("MaxLineLengthExceeded",)
+
+    return wrapper
+
+
+@_catch
+def reference(source: str, Mode: type[BaseMode]) -> Result:
+    with reference_engine():
+        mode = Mode(source, **EXTRA)
+        mode.tokenize()
+        mode.parse()
+        return _result(mode)
+
+
+@_catch
+def optimized(source: str, Mode: type[BaseMode]) -> Result:
+    document = Mode.parse_document(source, **EXTRA)
+    return (document.debug(), *(document.indent(t) for t in TABWIDTHS))
+
+
+@_catch
+def legacy(source: str, Mode: type[BaseMode]) -> Result:
+    return (
+        Mode(source, **EXTRA).debug(),
+        *(Mode(source, **EXTRA).indent(t) for t in TABWIDTHS),
+    )
+
+
+@_catch
+def hooked(source: str, Mode: type[BaseMode]) -> Result:
+    document = Mode.parse_document(source, **EXTRA, hooks=Hooks())
+    return (document.debug(), *(document.indent(t) for t in TABWIDTHS))
+
+
+@_catch
+def streamed(source: str, Mode: type[BaseMode]) -> Result:
+    lines = {}
+    count = source.count("\n") + 1
+    for event in Mode.events(source, **EXTRA):
+        if source[event.start : event.end] != event.token.text:
+            return ("wrong span",)
+        lines[event.line_number] = event.line
+        count -= event.token.text.count("\n")
+    mode = Mode(source)
+    mode.lines = [lines.get(nr, Line()) for nr in range(1, count + 1)]
+    return _result(mode)
+
+
+# The optimized paths that should give the same result as the
+# reference engine.
+PATHS: dict[str, Engine] = {
+    "parse_document": optimized,
+    "indent": legacy,
+    "hooks": hooked,
+    "events": streamed,
+}
+
+
+def check(source: str, Mode: type[BaseMode], idempotence: bool = True) -> str | None:
+    """
+    Return a description of the first problem with the template, or
+    None if there are no problems. Idempotence can be left unchecked,
+    because the indenter still has a few known quirks there.
+
+    """
+    try:
+        expected = reference(source, Mode)
+    except Exception as e:
+        return f"reference crashed: {e!r}"
+
+    for name, path in PATHS.items():
+        try:
+            actual = path(source, Mode)
+        except Exception as e:
+            return f"{name} crashed: {e!r}"
+        if actual != expected:
+            return f"{name} differs from reference"
+
+    if len(expected) == 1:
+        return None
+    for output in expected[1:]:
+        if [line.strip() for line in output.split("\n")] != [
+            line.strip() for line in source.split("\n")
+        ]:
+            return "non-whitespace changes"
+        if idempotence and reference(output, Mode)[1:] != expected[1:]:
+            return "not idempotent"
+    return None
+
+
+def minimize(
+    source: str, Mode: type[BaseMode], problem: str, idempotence: bool = True
+) -> str:
+    """
+    Remove lines and then characters from the template for as long as
+    the same problem occurs.
+
+    """
+    for separator in ["\n", ""]:
+        parts = source.split("\n") if separator else list(source)
+        chunk = len(parts) // 2
+        while chunk:
+            i = 0
+            while i < len(parts):
+                candidate = parts[:i] + parts[i + chunk :]
+                if check(separator.join(candidate), Mode, idempotence) == problem:
+                    parts = candidate
+                else:
+                    i += chunk
+            chunk //= 2
+        source = separator.join(parts)
+    return source
+
+
+def save(source: str, Mode: type[BaseMode], idempotence: bool = True) -> Path:
+    """
+    Write a failing template to the fuzz directory of the suite. The
+    filename records the mode and whether idempotence was checked.
+
+    """
+    name = next(name for name, M in MODES.items() if M is Mode)
+    if idempotence:
+        name += "-idempotence"
+    digest = hashlib.sha1(source.encode()).hexdigest()[:12]
+    FUZZ_DIR.mkdir(exist_ok=True)
+    path = FUZZ_DIR / f"{name}-{digest}.txt"
+    path.write_text(source)
+    return path
+
+
+def load(path: Path) -> tuple[str, type[BaseMode], bool]:
+    """
+    Return a saved template together with the mode and whether
+    idempotence was checked.
+
+    """
+    name, *flags, _ = path.stem.split("-")
+    return path.read_text(), MODES[name], "idempotence" in flags
+
+
+def fuzz(
+    seed: int, count: int, idempotence: bool = False, write: bool = True
+) -> list[str]:
+    """
+    Check the given number of templates and return the problems.
+
+    """
+    problems = []
+    for nr in range(seed, seed + count):
+        source = Generator(nr).template()
+        for Mode in MODES.values():
+            if problem := check(source, Mode, idempotence):
+                message = f"seed {nr}, {Mode.__name__}: {problem}"
+                if write:
+                    minimized = minimize(source, Mode, problem, idempotence)
+                    path = save(minimized, Mode, idempotence)
+                    message += f" (saved as {path.name})"
+                problems.append(message)
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("-n", "--count", type=int, default=100)
+    parser.add_argument("-s", "--seed", type=int, default=0)
+    parser.add_argument(
+        "--idempotence",
+        action="store_true",
+        help="also check that indenting the result again changes nothing",
+    )
+    args = parser.parse_args()
+    problems = fuzz(args.seed, args.count, args.idempotence)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    print(f"{args.count} templates, {len(problems)} problems", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
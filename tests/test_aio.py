@@ -0,0 +1,125 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable
+
+import djhtml
+from djhtml.modes import DjCSS, DjHTML
+
+
+class CountingExecutor(ThreadPoolExecutor):
+    """
+    A thread pool that keeps track of how many functions were
+    submitted, and how many of them ran at the same time.
+
+    """
+
+    def __init__(self, max_workers: int) -> None:
+        super().__init__(max_workers)
+        self.lock = threading.Lock()
+        self.submitted = self.running = self.max_running = 0
+
+    def submit(
+        self, fn: Callable[..., Any], /, *args: Any, **kwargs: Any
+    ) -> Future[Any]:
+        self.submitted += 1
+        return super().submit(self._count, fn, *args, **kwargs)
+
+    def _count(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+class TestAio(unittest.IsolatedAsyncioTestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def _executor(self, max_workers: int) -> CountingExecutor:
+        """
+        Return a thread pool that is shut down after the test, without
+        blocking the event loop while its threads finish.
+
+        """
+        executor = CountingExecutor(max_workers)
+        self.addAsyncCleanup(asyncio.to_thread, executor.shutdown)
+        return executor
+
+    async def test_aindent(self) -> None:
+        source = "a {\ncolor: red;\n}"
+        self.assertEqual(
+            await djhtml.aindent(source, tabwidth=2, Mode=DjCSS),
+            DjCSS(source).indent(2),
+        )
+        executor = self._executor(2)
+        results = await asyncio.gather(
+            *(
+                djhtml.aindent(path.read_text(), executor=executor)
+                for path in sorted(self.DIR.glob("*.html"))
+            )
+        )
+        self.assertEqual(
+            results,
+            [
+                DjHTML(path.read_text()).indent(4)
+                for path in sorted(self.DIR.glob("*.html"))
+            ],
+        )
+
+    async def test_aindent_files(self) -> None:
+        """
+        All files are indented, and written back when requested, while
+        no more than the given number of them run at the same time.
+
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            expected: dict[str, str] = {}
+            for path in sorted(self.DIR.glob("*.html")) * 3:
+                filename = str(Path(tmpdir) / f"{len(expected)}-{path.name}")
+                unindented = "\n".join(
+                    line.lstrip() for line in path.read_text().split("\n")
+                )
+                Path(filename).write_text(unindented)
+                expected[filename] = DjHTML(unindented).indent(4)
+
+            executor = self._executor(8)
+            results = {
+                filename: result
+                async for filename, result in djhtml.aindent_files(
+                    expected, executor=executor, concurrency=3, write=True
+                )
+            }
+            self.assertEqual(results, expected)
+            self.assertLessEqual(executor.max_running, 3)
+            for filename, result in expected.items():
+                self.assertEqual(Path(filename).read_text(), result)
+
+    async def test_backpressure(self) -> None:
+        """
+        Files are only started when results are consumed, and the rest
+        is cancelled when the consumer stops iterating.
+
+        """
+        filenames = [str(path) for path in sorted(self.DIR.glob("*.html"))] * 10
+        executor = self._executor(8)
+        results = djhtml.aindent_files(filenames, executor=executor, concurrency=2)
+        async for _ in results:
+            self.assertLessEqual(executor.submitted, 2)
+            break
+        await results.aclose()
+        self.assertLessEqual(executor.submitted, 3)
+
+    async def test_errors(self) -> None:
+        with self.assertRaises(FileNotFoundError):
+            async for _ in djhtml.aindent_files(["does-not-exist.html"]):
+                pass
+        with self.assertRaises(ValueError):
+            async for _ in djhtml.aindent_files([], concurrency=0):
+                pass
@@ -0,0 +1,127 @@
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from djhtml import bench
+from djhtml.modes import DjCSS, DjHTML, DjJS, DjTXT
+
+
+class TestBench(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def setUp(self) -> None:
+        # Only the templates of the suite, not the saved fuzz cases.
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.templates = tmpdir.name
+        for path in self.DIR.glob("*.html"):
+            shutil.copy(path, self.templates)
+
+    def test_replay(self) -> None:
+        mode_names = {"html": DjHTML, "css": DjCSS, "js": DjJS, "txt": DjTXT}
+        results = bench.replay(self.templates, mode_names, repeat=2)
+        self.assertEqual(
+            sorted(results["files"]),
+            sorted(path.name for path in self.DIR.glob("*.html")),
+        )
+        for result in results["files"].values():
+            self.assertEqual(result["mode"], "DjHTML")
+            self.assertGreater(result["bytes"], 0)
+            self.assertGreater(result["tokens"], 0)
+            self.assertGreater(result["peak_memory"], 0)
+            self.assertEqual(len(result["times"]), 2)
+
+    def test_replay_errors(self) -> None:
+        """
+        Templates that can't be read or indented are skipped.
+
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            (Path(tmpdir) / "min.js").write_text("var a=1;" * 3000 + "\n")
+            (Path(tmpdir) / "latin1.html").write_bytes(b"<p>\xff</p>\n")
+            (Path(tmpdir) / "ok.css").write_text("a {\ncolor: red;\n}\n")
+            with mock.patch.object(bench, "_info") as info:
+                results = bench.replay(
+                    tmpdir, {"html": DjHTML, "css": DjCSS, "js": DjJS}
+                )
+        self.assertEqual(list(results["files"]), ["ok.css"])
+        self.assertEqual(info.call_count, 2)
+        self.assertIn("maximum line length exceeded", str(info.call_args_list))
+
+    def test_compare(self) -> None:
+        """
+        Only slowdowns that exceed both the threshold and the noise are
+        reported, from the largest one down.
+
+        """
+        baseline = {
+            "files": {
+                "same.html": {"times": [0.010, 0.011, 0.010]},
+                "slower.html": {"times": [0.010, 0.010, 0.010]},
+                "much-slower.html": {"times": [0.010, 0.010, 0.010]},
+                "noisy.html": {"times": [0.010, 0.020, 0.005]},
+                "tiny.html": {"times": [0.00001, 0.00001, 0.00001]},
+                "zero.html": {"times": [0.0, 0.0, 0.0]},
+            }
+        }
+        results = {
+            "files": {
+                "same.html": {"times": [0.0105, 0.010, 0.011]},
+                "slower.html": {"times": [0.012, 0.012, 0.012]},
+                "much-slower.html": {"times": [0.020, 0.021, 0.020]},
+                "noisy.html": {"times": [0.015, 0.030, 0.010]},
+                "tiny.html": {"times": [0.00002, 0.00002, 0.00002]},
+                "zero.html": {"times": [0.001, 0.001, 0.001]},
+                "new.html": {"times": [1.0, 1.0, 1.0]},
+            }
+        }
+        self.assertEqual(
+            bench.compare(baseline, results, threshold=0.05),
+            [
+                ("zero.html", 0.0, 0.001),
+                ("much-slower.html", 0.010, 0.020),
+                ("slower.html", 0.010, 0.012),
+            ],
+        )
+        self.assertEqual(
+            bench.compare(baseline, results, threshold=0.5),
+            [("zero.html", 0.0, 0.001), ("much-slower.html", 0.010, 0.020)],
+        )
+
+    def test_baseline(self) -> None:
+        """
+        Files that are slower than the saved baseline are reported, and
+        make the command exit with status 1. Files that were too fast to
+        measure in the baseline are reported without a factor.
+
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            baseline = Path(tmpdir) / "baseline.json"
+            result = subprocess.run(
+                [sys.executable, "-m", "djhtml.bench", "replay", "--repeat", "5"]
+                + ["--save", str(baseline), self.templates],
+                capture_output=True,
+            )
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn(b"templates took", result.stderr)
+
+            data = json.loads(baseline.read_text())
+            data["files"]["html.html"]["times"] = [0.00001, 0.00001]
+            data["files"]["css.html"]["times"] = [0.0, 0.0]
+            baseline.write_text(json.dumps(data))
+            result = subprocess.run(
+                [sys.executable, "-m", "djhtml.bench", "replay", "--repeat", "5"]
+                + ["--baseline", str(baseline), "--top", "2", self.templates],
+                capture_output=True,
+            )
+            self.assertEqual(result.returncode, 1, result.stderr)
+            zero, slower = result.stdout.splitlines()
+            self.assertTrue(zero.startswith(b"css.html: 0.00 ms -> "))
+            self.assertTrue(zero.endswith(b" ms"))
+            self.assertTrue(slower.startswith(b"html.html: 0.01 ms -> "))
+            self.assertTrue(slower.endswith(b"x)"))
@@ -0,0 +1,49 @@
+import unittest
+from pathlib import Path
+
+from djhtml.modes import DjHTML
+
+
+class TestDocument(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def test_levels_and_offsets(self) -> None:
+        document = DjHTML.parse_document('<div>\n<a href="x"\nclass="y">\n</a>\n</div>')
+        self.assertEqual(document.levels, [0, 1, 1, 1, 0])
+        self.assertEqual(document.offsets, [0, 0, 3, 0, 0])
+
+        for path in sorted(self.DIR.glob("*.html")):
+            with self.subTest(path.name):
+                document = DjHTML.parse_document(path.read_text())
+                self.assertEqual(
+                    document.levels, [line.level for line in document.lines]
+                )
+                self.assertEqual(
+                    document.offsets, [line.offset for line in document.lines]
+                )
+
+    def test_diff(self) -> None:
+        """
+        The diff is empty when the template is already indented with
+        the given tabwidth, and shows the changed lines otherwise.
+
+        """
+        for path in sorted(self.DIR.glob("*.html")):
+            with self.subTest(path.name):
+                source = path.read_text()
+                document = DjHTML.parse_document(
+                    source,
+                    extra_blocks={"weird_tag": "endweird"},
+                    extra_middle_tags=["weird_middle"],
+                )
+                self.assertEqual(document.diff(4), "")
+                unindented = DjHTML.parse_document(document.indent(0))
+                self.assertNotEqual(unindented.diff(4), "")
+                self.assertEqual(unindented.diff(0), "")
+
+        document = DjHTML.parse_document("<div>\n<p>\n</p>\n</div>")
+        self.assertEqual(
+            document.diff(2, "t.html"),
+            "--- t.html\n+++ t.html\n@@ -1,4 +1,4 @@\n"
+            " <div>\n-<p>\n-</p>\n+  <p>\n+  </p>\n </div>",
+        )
@@ -0,0 +1,59 @@
+import unittest
+from pathlib import Path
+
+from djhtml.modes import DjHTML, MaxLineLengthExceeded
+
+
+class TestEvents(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def test_events(self) -> None:
+        """
+        The events have the same tokens and levels as a parsed
+        document, and their spans point into the source.
+
+        """
+        for path in sorted(self.DIR.glob("*.html")):
+            with self.subTest(path.name):
+                source = path.read_text()
+                document = DjHTML.parse_document(source)
+                events = list(DjHTML.events(source))
+                self.assertEqual(
+                    [repr(event.token) for event in events],
+                    [repr(token) for line in document.lines for token in line.tokens],
+                )
+                for event in events:
+                    self.assertEqual(source[event.start : event.end], event.token.text)
+                    line = document.lines[event.line_number - 1]
+                    self.assertEqual(
+                        (event.level, event.offset), (line.level, line.offset)
+                    )
+
+    def test_depth(self) -> None:
+        events = DjHTML.events("<div>\n{% if x %}<p></p>\n{% endif %}</div>")
+        self.assertEqual(
+            [(event.token.text, event.depth) for event in events],
+            [
+                ("<", 0),
+                ("div", 0),
+                (">", 1),
+                ("{% if x %}", 2),
+                ("<", 2),
+                ("p", 2),
+                (">", 3),
+                ("</p>", 2),
+                ("{% endif %}", 1),
+                ("</div>", 0),
+            ],
+        )
+
+    def test_streaming(self) -> None:
+        """
+        Events are generated before the rest of the source has been
+        tokenized.
+
+        """
+        events = DjHTML.events("<div>\n" + "x" * 20_000 + "\n</div>")
+        self.assertEqual(next(events).token.text, "<")
+        with self.assertRaises(MaxLineLengthExceeded):
+            list(events)
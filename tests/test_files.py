@@ -0,0 +1,50 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from djhtml import files
+
+
+class TestFiles(unittest.TestCase):
+    def setUp(self) -> None:
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = Path(tmpdir.name) / "template.html"
+        self.path.write_text("<div>\n</div>\n")
+
+    @unittest.skipIf(os.name == "nt", "Windows only has a read-only flag")
+    def test_permissions(self) -> None:
+        """
+        The replaced file keeps its permissions, even those that are
+        excluded by the umask.
+
+        """
+        self.path.chmod(0o666)
+        umask = os.umask(0o022)
+        try:
+            files.write(str(self.path), "<p>\n</p>\n", "\n", "utf-8")
+        finally:
+            os.umask(umask)
+        self.assertEqual(self.path.read_text(), "<p>\n</p>\n")
+        self.assertEqual(self.path.stat().st_mode & 0o7777, 0o666)
+
+    def test_in_place(self) -> None:
+        """
+        Files with hard links, or in directories that aren't writable,
+        are overwritten in place instead of replaced.
+
+        """
+        link = self.path.with_name("link.html")
+        os.link(self.path, link)
+        files.write(str(self.path), "<p>\n</p>\n", "\r\n", "utf-8")
+        self.assertEqual(link.read_bytes(), b"<p>\r\n</p>\r\n")
+        link.unlink()
+
+        inode = self.path.stat().st_ino
+        with mock.patch("os.access", return_value=False):
+            files.write(str(self.path), "<a>\n</a>\n", "\n", "utf-8")
+        self.assertEqual(self.path.read_text(), "<a>\n</a>\n")
+        self.assertEqual(self.path.stat().st_ino, inode)
+        self.assertEqual(os.listdir(self.path.parent), ["template.html"])
@@ -0,0 +1,24 @@
+import unittest
+
+from . import fuzz
+
+
+class TestFuzz(unittest.TestCase):
+    def test_optimized_paths(self) -> None:
+        """
+        The optimized paths give exactly the same result as the
+        reference engine, and only change whitespace.
+
+        """
+        self.assertEqual(fuzz.fuzz(0, 100, idempotence=False, write=False), [])
+
+    def test_saved_cases(self) -> None:
+        """
+        The cases that were found by the fuzzer no longer fail the
+        checks that found them.
+
+        """
+        for path in sorted(fuzz.FUZZ_DIR.glob("*.txt")):
+            with self.subTest(path.name):
+                source, Mode, idempotence = fuzz.load(path)
+                self.assertIsNone(fuzz.check(source, Mode, idempotence))
@@ -0,0 +1,59 @@
+import unittest
+from pathlib import Path
+
+from djhtml.hooks import Hooks, Profiler
+from djhtml.lines import Line
+from djhtml.modes import BaseMode, DjHTML
+from djhtml.tokens import Token
+
+
+class RecordingHooks(Hooks):
+    def __init__(self) -> None:
+        self.tokens: list[Token.BaseToken] = []
+        self.lines: list[Line] = []
+        self.depth = 0
+
+    def token_created(self, token: Token.BaseToken, mode: BaseMode) -> None:
+        self.tokens.append(token)
+
+    def pushed(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        self.depth += 1
+
+    def popped(self, token: Token.BaseToken, stack: list[Token.BaseToken]) -> None:
+        self.depth -= 1
+
+    def line_finalized(self, line: Line) -> None:
+        self.lines.append(line)
+
+
+class TestHooks(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def test_events(self) -> None:
+        """
+        Hooks see every token and line exactly once, and don't change
+        the result.
+
+        """
+        for path in sorted(self.DIR.glob("*.html")):
+            with self.subTest(path.name):
+                source = path.read_text()
+                hooks = RecordingHooks()
+                document = DjHTML.parse_document(source, hooks=hooks)
+                self.assertEqual(
+                    document.debug(), DjHTML.parse_document(source).debug()
+                )
+                tokens = [token for line in document.lines for token in line.tokens]
+                self.assertEqual(list(map(id, hooks.tokens)), list(map(id, tokens)))
+                self.assertEqual(hooks.lines, document.lines)
+                self.assertGreaterEqual(hooks.depth, 0)
+
+    def test_profiler(self) -> None:
+        profiler = Profiler()
+        DjHTML.parse_document(
+            "<div>\n<style>\na {\n}\n</style>\n</div>\n", hooks=profiler
+        )
+        self.assertEqual(profiler.counts["lines"], 7)
+        self.assertEqual(profiler.counts["mode switches"], 5)
+        self.assertIn("parse", profiler.timings)
+        self.assertIn("time in DjCSS", profiler.summary())
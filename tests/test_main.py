@@ -0,0 +1,270 @@
+import json
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+
+class TestMain(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def _run(
+        self, *args: str, stdin: bytes = b"", module: str = "djhtml"
+    ) -> subprocess.CompletedProcess[bytes]:
+        return subprocess.run(
+            [sys.executable, "-m", module, *args],
+            input=stdin,
+            capture_output=True,
+        )
+
+    def test_stdin_batch(self) -> None:
+        """
+        Templates are indented one by one, optionally with a different
+        mode or tabwidth, and written back in the same order.
+
+        """
+        result = self._run(
+            "--stdin-batch",
+            stdin=(
+                b"<div>\n<p>\n</p>\n</div>\0"
+                b"\x01mode=css tabwidth=2\na {\ncolor: red;\n}\0"
+                b"\x01mode=unknown\n<div>\n</div>\0"
+                b"<div>\n</div>"
+            ),
+        )
+        self.assertEqual(result.returncode, 123)
+        self.assertEqual(
+            result.stdout.split(b"\0"),
+            [
+                b"<div>\n    <p>\n    </p>\n</div>",
+                b"a {\n  color: red;\n}",
+                b"<div>\n</div>",
+                b"<div>\n</div>",
+                b"",
+            ],
+        )
+
+    def test_shards(self) -> None:
+        """
+        Each file is indented by exactly one shard, and the merged
+        report has the same exit status as an unsharded run. Reports
+        can only be merged when every shard is given exactly once.
+
+        """
+        unsharded = self._run("--check", "--report", "json", str(self.DIR))
+        with tempfile.TemporaryDirectory() as tmpdir:
+            reports = []
+            for index in [1, 2, 3]:
+                result = self._run(
+                    "--check", "--report", "json", f"--shard={index}/3", str(self.DIR)
+                )
+                reports.append(Path(tmpdir) / f"{index}.json")
+                reports[-1].write_bytes(result.stdout)
+
+            statuses = [
+                {
+                    f["filename"]: f["status"]
+                    for f in json.loads(path.read_text())["files"]
+                }
+                for path in reports
+            ]
+            for filename in statuses[0]:
+                processed = [s[filename] for s in statuses if s[filename] != "skipped"]
+                self.assertEqual(len(processed), 1)
+
+            merged = self._run(
+                *map(str, reports),
+                "--output",
+                str(Path(tmpdir) / "merged.json"),
+                module="djhtml.report",
+            )
+            self.assertEqual(merged.returncode, unsharded.returncode)
+            self.assertEqual(
+                json.loads((Path(tmpdir) / "merged.json").read_text())["summary"],
+                json.loads(unsharded.stdout)["summary"],
+            )
+
+            incomplete = self._run(
+                str(reports[0]), str(reports[2]), module="djhtml.report"
+            )
+            self.assertEqual(incomplete.returncode, 1)
+            self.assertEqual(incomplete.stderr, b"Error: missing shard 2/3\n")
+            duplicate = self._run(
+                *map(str, reports + reports[1:2]), module="djhtml.report"
+            )
+            self.assertEqual(duplicate.stderr, b"Error: duplicate shard 2/3\n")
+
+    def test_newlines(self) -> None:
+        """
+        Files are only written when their indentation changed, and
+        keep their original line endings.
+
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            changed = Path(tmpdir) / "changed.html"
+            changed.write_bytes(b"<div>\r\n<p>\r\n</p>\r\n</div>\r\n")
+            unchanged = Path(tmpdir) / "unchanged.html"
+            unchanged.write_bytes(b"<div>\r\n</div>\n")
+            mtime = unchanged.stat().st_mtime_ns
+
+            result = self._run(str(changed), str(unchanged))
+            self.assertEqual(result.returncode, 0)
+            self.assertEqual(
+                changed.read_bytes(), b"<div>\r\n    <p>\r\n    </p>\r\n</div>\r\n"
+            )
+            self.assertEqual(unchanged.read_bytes(), b"<div>\r\n</div>\n")
+            self.assertEqual(unchanged.stat().st_mtime_ns, mtime)
+
+    def test_all_languages(self) -> None:
+        """
+        All languages are indented in a single run, each file in the
+        mode of its extension.
+
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sources = {
+                "a.html": "<div>\n<p>\n</p>\n</div>\n",
+                "b/c.css": "a {\ncolor: red;\n}\n",
+                "b/d.js": "if (x) {\ny();\n}\n",
+                "b/e.txt": "{% if x %}\ny\n{% endif %}\n",
+                "f.jinja": "<div>\n<p>\n</p>\n</div>\n",
+                "g.md": "{% if x %}\ny\n{% endif %}\n",
+            }
+            for name, source in sources.items():
+                (Path(tmpdir) / name).parent.mkdir(exist_ok=True)
+                (Path(tmpdir) / name).write_text(source)
+
+            result = self._run("-a", "--extra-suffix", ".jinja=html", tmpdir)
+            self.assertEqual(result.returncode, 0)
+            self.assertIn(b"5 templates have been reindented.", result.stderr)
+            self.assertEqual(
+                (Path(tmpdir) / "b/c.css").read_text(), "a {\n    color: red;\n}\n"
+            )
+            self.assertEqual(
+                (Path(tmpdir) / "b/d.js").read_text(), "if (x) {\n    y();\n}\n"
+            )
+            self.assertEqual((Path(tmpdir) / "g.md").read_text(), sources["g.md"])
+
+    def test_io_threads(self) -> None:
+        """
+        Reading, indenting and writing in threads gives exactly the
+        same messages, exit status and files as doing it in sequence.
+
+        """
+        results = []
+        for args in [
+            [],
+            ["--io-threads", "3"],
+            ["--threads", "4"],
+            ["--threads", "4", "--io-threads", "2"],
+        ]:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                for nr in range(20):
+                    path = Path(tmpdir) / f"{nr:02}.html"
+                    if nr % 7 == 3:
+                        path.write_bytes(b"<div>\n\xff\n</div>\n")
+                    else:
+                        path.write_text("<div>\n" * (nr % 3) + "</div>\n" * (nr % 3))
+                result = self._run(*args, tmpdir)
+                results.append(
+                    (
+                        result.returncode,
+                        result.stderr.replace(tmpdir.encode(), b""),
+                        sorted(p.read_bytes() for p in Path(tmpdir).iterdir()),
+                    )
+                )
+        for other_result in results[1:]:
+            self.assertEqual(results[0], other_result)
+        self.assertEqual(results[0][0], 123)
+
+    def test_negative_threads(self) -> None:
+        """
+        The numbers of threads can't be negative.
+
+        """
+        for option in ["--threads", "--io-threads"]:
+            with self.subTest(option):
+                result = self._run(f"{option}=-1", str(self.DIR))
+                self.assertEqual(result.returncode, 2)
+                self.assertIn(b"invalid count value: '-1'", result.stderr)
+
+    def test_threads_and_io_threads(self) -> None:
+        """
+        Indenting in threads while reading ahead in other threads never
+        fails files that were read fine, no matter the timing.
+
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            for nr in range(200):
+                (Path(tmpdir) / f"{nr:03}.html").write_text("<div></div>\n")
+            for _ in range(10):
+                result = self._run("--threads", "8", "--io-threads", "1", tmpdir)
+                self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_ignore_data(self) -> None:
+        source = b'<div>\n<script type="importmap">\n{\n"a": "b"\n}\n</script>\n</div>'
+        self.assertEqual(
+            self._run("-", stdin=source).stdout,
+            b'<div>\n    <script type="importmap">\n        {\n            "a": "b"\n'
+            b"        }\n    </script>\n</div>",
+        )
+        self.assertEqual(
+            self._run("--ignore-data", "-", stdin=source).stdout,
+            b'<div>\n    <script type="importmap">\n{\n"a": "b"\n}\n</script>\n</div>',
+        )
+
+    def test_emit_edits(self) -> None:
+        """
+        Applying the edits gives the same result as reindenting the
+        files, which are left untouched.
+
+        """
+        with tempfile.TemporaryDirectory() as tmpdir:
+            sources = {}
+            for path in sorted(self.DIR.glob("*.html")):
+                unindented = "\n".join(
+                    line.lstrip() for line in path.read_text().split("\n")
+                )
+                sources[path.name] = unindented
+                (Path(tmpdir) / path.name).write_text(unindented)
+
+            result = self._run("--emit-edits", "json", "--tabwidth", "4", tmpdir)
+            self.assertEqual(result.returncode, 1)
+            self.assertEqual(len(result.stdout.splitlines()), len(sources))
+            for line in result.stdout.splitlines():
+                data = json.loads(line)
+                path = Path(data["filename"])
+                self.assertEqual(path.read_text(), sources[path.name])
+                lines = path.read_text().split("\n")
+                for line_number, old_indent, new_indent in data["edits"]:
+                    self.assertTrue(lines[line_number - 1].startswith(old_indent))
+                    lines[line_number - 1] = (
+                        new_indent + lines[line_number - 1][len(old_indent) :]
+                    )
+                path.write_text("\n".join(lines))
+
+            result = self._run("--check", "--tabwidth", "4", tmpdir)
+            self.assertEqual(result.returncode, 0, result.stderr)
+
+    def test_record_shape(self) -> None:
+        """
+        The anonymized copy has the same length as the template and can
+        be replayed with djhtml-bench.
+
+        """
+        source = self.DIR / "js.html"
+        with tempfile.TemporaryDirectory() as tmpdir:
+            shape = Path(tmpdir) / "shape.html"
+            result = self._run("--check", "--record-shape", str(shape), str(source))
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn(b"recorded the shape", result.stderr)
+            self.assertNotIn(b"differently", result.stderr)
+            self.assertEqual(len(shape.read_text()), len(source.read_text()))
+
+            result = self._run("tokenize", str(shape), module="djhtml.bench")
+            self.assertEqual(result.returncode, 0, result.stderr)
+            self.assertIn(b"time in tokenize", result.stdout)
+
+        result = self._run("--record-shape", "shape.html", str(self.DIR))
+        self.assertIn(b"requires a single template", result.stderr)
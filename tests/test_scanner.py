@@ -0,0 +1,50 @@
+import unittest
+from pathlib import Path
+
+from djhtml.modes import (
+    BaseMode,
+    DjCSS,
+    DjHTML,
+    DjJS,
+    DjJSON,
+    InsideHTMLTag,
+    Scanner,
+    compile_re,
+    compile_scanner,
+)
+
+
+class TestScanner(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def test_identical_matches(self) -> None:
+        """
+        Searching with the prefilter finds exactly the same raw tokens
+        as searching with the full regex, from every position.
+
+        """
+        sources = [path.read_text() for path in sorted(self.DIR.glob("*.html"))]
+        sources.append("myvar: 1; ifx: 2 a-b: c <a=b> {x {%x%}=y =z {%- if -%}")
+        modes: list[type[BaseMode]] = [DjCSS, DjJS, InsideHTMLTag]
+        for Mode in modes:
+            with self.subTest(Mode.__name__):
+                scanner = compile_scanner(Mode.RAW_TOKENS)
+                self.assertIsInstance(scanner, Scanner)
+                pattern = compile_re(Mode.RAW_TOKENS)
+                for source in sources:
+                    for pos in range(len(source) + 1):
+                        expected = pattern.search(source, pos)
+                        actual = scanner.search(source, pos)
+                        self.assertEqual(
+                            expected and expected.span(), actual and actual.span()
+                        )
+
+    def test_plain_regex(self) -> None:
+        """
+        Modes whose raw tokens all start with a literal character don't
+        need a prefilter, and neither do raw tokens that can't be
+        analyzed.
+
+        """
+        for raw_tokens in [DjHTML.RAW_TOKENS, DjJSON.RAW_TOKENS, [r"\n", r".x"]]:
+            self.assertNotIsInstance(compile_scanner(raw_tokens), Scanner)
@@ -0,0 +1,62 @@
+import re
+import unittest
+from pathlib import Path
+
+from djhtml import shape
+from djhtml.modes import BaseMode, DjCSS, DjHTML, DjJS, DjTXT
+
+from . import fuzz
+
+
+class TestShape(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def test_same_tokens(self) -> None:
+        """
+        The anonymized copy of a template is tokenized and indented in
+        exactly the same way as the template itself.
+
+        """
+        sources = [path.read_text() for path in sorted(self.DIR.glob("*.html"))]
+        sources += [fuzz.Generator(seed).template() for seed in range(100)]
+        modes: list[type[BaseMode]] = [DjHTML, DjCSS, DjJS, DjTXT]
+        for Mode in modes:
+            for source in sources:
+                anonymized = shape.anonymize(Mode(source, **fuzz.EXTRA))
+                self.assertEqual(len(anonymized), len(source))
+                self.assertIsNone(
+                    shape.first_difference(
+                        Mode.parse_document(source, **fuzz.EXTRA).lines,
+                        Mode.parse_document(anonymized, **fuzz.EXTRA).lines,
+                    )
+                )
+
+    def test_no_text(self) -> None:
+        """
+        Only the names of tags and a few keywords are kept, and only
+        where the tokenizer depends on them.
+
+        """
+        source = (
+            '<p class="secret">Secret 42 {% if secret %}{{ secret }}{% endif %}\n'
+            '<script type="text/template">if (secret) var secret = "hush"</script>\n'
+            '<p title="<jane.doe@acme.com>">type=confidential</p>\n'
+            "<script>if (count<customerLimit) var email = "
+            '"<jane.doe@acme.com>"</script>'
+        )
+        anonymized = shape.anonymize(DjHTML(source))
+        self.assertEqual(
+            anonymized,
+            '<p xxxxx="xxxxxx">Xxxxxx 00 {% if xxxxxx %}{{ xxxxxx }}{% endif %}\n'
+            '<script type="text/template">xx (xxxxxx) xxx xxxxxx = "xxxx"</script>\n'
+            '<p xxxxx="<xxxx.xxx@xxxx.xxx>">xxxx=xxxxxxxxxxxx</p>\n'
+            "<script>if (xxxxx<xxxxxxxxXxxxx) var xxxxx = "
+            '"<xxxx.xxx@xxxx.xxx>"</script>',
+        )
+        self.assertFalse(
+            re.search(
+                "secret|hush|42|customer|limit|jane|doe|acme|confidential",
+                anonymized,
+                re.IGNORECASE,
+            )
+        )
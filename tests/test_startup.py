@@ -0,0 +1,58 @@
+import subprocess
+import sys
+import unittest
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Keep the start-up time of the command-line tools in check, as it
+    dominates the total running time when only a few files are
+    indented, e.g. by pre-commit.
+
+    """
+
+    # Modules that take a long time to import and are not needed to
+    # indent templates.
+    SLOW_MODULES = {"typing", "importlib.metadata", "pathlib"}
+
+    # Generous budget in microseconds for importing the djhtml package,
+    # as source files might have to be compiled on the CI runners.
+    BUDGET = 100_000
+
+    def _import_times(self, code: str) -> dict[str, int]:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+        )
+        import_times = {}
+        for line in result.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line.split("|")
+                if cumulative.strip().isdigit():
+                    import_times[name.strip()] = int(cumulative)
+        return import_times
+
+    def test_import_time(self) -> None:
+        baseline = self._import_times("pass")
+        import_times = self._import_times(
+            "import sys; sys.argv = ['djhtml', '-']; import djhtml.__main__"
+        )
+        imported = import_times.keys() - baseline.keys()
+
+        self.assertIn("djhtml.modes", imported)
+        self.assertFalse(imported & self.SLOW_MODULES)
+        self.assertLess(
+            sum(
+                import_times[name]
+                for name in ["djhtml", "djhtml.modes", "djhtml.options"]
+            ),
+            self.BUDGET,
+        )
+
+    def test_version_is_imported_lazily(self) -> None:
+        import_times = self._import_times(
+            "import sys; sys.argv = ['djhtml', '--version']; import djhtml.__main__"
+        )
+        self.assertIn("importlib.metadata", import_times)
+        self.assertNotIn("djhtml.modes", import_times)
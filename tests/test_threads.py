@@ -0,0 +1,63 @@
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from unittest import mock
+
+from djhtml import modes
+from djhtml.hooks import Profiler
+
+from . import fuzz
+
+
+class TestThreads(unittest.TestCase):
+    DIR = Path(__file__).parent / "suite"
+
+    def setUp(self) -> None:
+        # Switch between threads as often as possible, to give races a
+        # chance to happen when the GIL is enabled.
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+    def test_concurrent_indent(self) -> None:
+        """
+        Indenting many templates in many threads at the same time, with
+        empty regex caches, gives the same results as indenting them one
+        by one.
+
+        """
+        sources = [path.read_text() for path in sorted(self.DIR.glob("*.html"))]
+        sources += [fuzz.Generator(seed).template() for seed in range(50)]
+        jobs = [
+            (source, Mode, profile)
+            for Mode in fuzz.MODES.values()
+            for source in sources
+            for profile in [False, True]
+        ]
+
+        def indent(job: tuple[str, type[modes.BaseMode], bool]) -> str:
+            source, Mode, profile = job
+            hooks = Profiler() if profile else None
+            document = Mode.parse_document(source, hooks=hooks, **fuzz.EXTRA)
+            return repr(document.lines) + document.indent(4) + document.indent(2)
+
+        expected = list(map(indent, jobs))
+        with mock.patch.dict(modes._compiled_res, clear=True), mock.patch.dict(
+            modes._compiled_scanners, clear=True
+        ):
+            with ThreadPoolExecutor(8) as executor:
+                actual = list(executor.map(indent, jobs * 3))
+        self.assertEqual(actual, expected * 3)
+
+    def test_shared_document(self) -> None:
+        """
+        A parsed document can be rendered by many threads at once.
+
+        """
+        source = "\n".join(path.read_text() for path in sorted(self.DIR.glob("*.html")))
+        document = modes.DjHTML.parse_document(source)
+        tabwidths = [1, 2, 3, 4] * 8
+        with ThreadPoolExecutor(8) as executor:
+            actual = list(executor.map(document.indent, tabwidths))
+        self.assertEqual(actual, [document.indent(tabwidth) for tabwidth in tabwidths])